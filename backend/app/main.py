@@ -1,6 +1,8 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Form, Request
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Form, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import Response
+from fastapi.encoders import jsonable_encoder
 from pymongo import MongoClient, errors
 from bson import ObjectId
 from datetime import datetime
@@ -8,14 +10,38 @@ import os
 import fitz  # PyMuPDF
 import bcrypt
 import jwt
+import groq
 from groq import Groq
 from typing import Optional
 import shutil
 import tempfile
 import uuid
 import re
+import time
+import hashlib
+import math
+import html
+import json
+import base64
+import gzip
+import cProfile
+import threading
+import bisect
+import asyncio
+from collections import OrderedDict, deque
+from types import SimpleNamespace
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # falls back to the standard library encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
 # Load environment variables
 load_dotenv()
 
@@ -26,6 +52,136 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Upload admission control (applied before the request body is read)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+UPLOAD_PATHS = ("/upload-document", "/test-upload")
+UPLOAD_MAX_CONCURRENT = int(os.getenv("UPLOAD_MAX_CONCURRENT", "8"))
+UPLOAD_MAX_CONCURRENT_PER_USER = int(os.getenv("UPLOAD_MAX_CONCURRENT_PER_USER", "2"))
+EXTRACTION_MAX_CONCURRENT = int(os.getenv("EXTRACTION_MAX_CONCURRENT", "2"))
+PENDING_ANALYSES_MAX = int(os.getenv("PENDING_ANALYSES_MAX", "50"))
+PENDING_ANALYSES_MAX_PER_USER = int(os.getenv("PENDING_ANALYSES_MAX_PER_USER", "5"))
+UPLOAD_RETRY_AFTER_SECONDS = int(os.getenv("UPLOAD_RETRY_AFTER_SECONDS", "10"))
+
+class UploadTooLarge(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=413, detail=f"File size exceeds {MAX_UPLOAD_BYTES / (1024 * 1024):g}MB limit")
+
+class UploadAdmissionMiddleware:
+    """
+    Admits or sheds upload requests before FastAPI spools the body to disk:
+    rejects oversized Content-Length, caps in-flight uploads globally (503) and
+    per user (429), refuses uploads while too many analyses are pending, and
+    aborts bodies that grow past the byte limit while streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = 0
+        self.in_flight_per_user = {}
+        self.stats = {"admitted": 0, "rejectedTooLarge": 0, "shedGlobal": 0, "shedPerUser": 0}
+
+    @staticmethod
+    def _user_id(scope) -> Optional[str]:
+        """Best-effort user id from the bearer token, without touching the database"""
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                token = value.decode("latin-1").split(" ", 1)[-1]
+                try:
+                    return str(jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM]).get("userId"))
+                except Exception:
+                    return None
+        return None
+
+    async def _reject(self, send, status_code: int, detail: str, retry_after: Optional[int] = None):
+        body = json.dumps({"detail": detail}).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        if retry_after is not None:
+            headers.append((b"retry-after", str(retry_after).encode()))
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in UPLOAD_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        limit = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+        headers = dict(scope.get("headers", []))
+        try:
+            content_length = int(headers.get(b"content-length", b"0"))
+        except ValueError:
+            content_length = 0
+        if content_length > limit:
+            self.stats["rejectedTooLarge"] += 1
+            await self._reject(send, 413, UploadTooLarge().detail)
+            return
+
+        user_id = self._user_id(scope)
+        if self.in_flight >= UPLOAD_MAX_CONCURRENT or llm_scheduler.queued_count(PRIORITY_BACKGROUND) >= PENDING_ANALYSES_MAX:
+            self.stats["shedGlobal"] += 1
+            await self._reject(send, 503, "Server is busy processing uploads, please retry shortly", UPLOAD_RETRY_AFTER_SECONDS)
+            return
+        if user_id and (
+            self.in_flight_per_user.get(user_id, 0) >= UPLOAD_MAX_CONCURRENT_PER_USER
+            or llm_scheduler.queued_count(PRIORITY_BACKGROUND, user_id) >= PENDING_ANALYSES_MAX_PER_USER
+        ):
+            self.stats["shedPerUser"] += 1
+            await self._reject(send, 429, "Too many uploads in progress, please retry shortly", UPLOAD_RETRY_AFTER_SECONDS)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    self.stats["rejectedTooLarge"] += 1
+                    raise UploadTooLarge()
+            return message
+
+        response_started = False
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        self.in_flight += 1
+        if user_id:
+            self.in_flight_per_user[user_id] = self.in_flight_per_user.get(user_id, 0) + 1
+        self.stats["admitted"] += 1
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except UploadTooLarge as e:
+            if not response_started:
+                await self._reject(send, 413, e.detail)
+        finally:
+            self.in_flight -= 1
+            if user_id:
+                remaining = self.in_flight_per_user.get(user_id, 1) - 1
+                if remaining > 0:
+                    self.in_flight_per_user[user_id] = remaining
+                else:
+                    self.in_flight_per_user.pop(user_id, None)
+
+    def metrics(self) -> dict:
+        return {**self.stats, "inFlight": self.in_flight, "maxConcurrent": UPLOAD_MAX_CONCURRENT}
+
+upload_admission = None
+
+def build_upload_admission(app):
+    """Middleware factory that keeps a handle on the instance for /metrics"""
+    global upload_admission
+    upload_admission = UploadAdmissionMiddleware(app)
+    return upload_admission
+
+# Must be added before CORS so CORS (outermost) decorates rejections too
+app.add_middleware(build_upload_admission)
+
 # CORS middleware - Allow frontend
 app.add_middleware(
     CORSMiddleware,
@@ -36,114 +192,347 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Opt-in per-request profiling: set PROFILING_ENABLED=true, then send "X-Profile: 1"
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "lexibridge-profiles"))
+
+async def profile_request(request: Request, call_next):
+    """Profile a single request and write the trace to PROFILE_DIR (pyinstrument HTML, else cProfile .prof)"""
+    if request.headers.get("x-profile") != "1":
+        return await call_next(request)
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{request.method}-{request.url.path.strip('/').replace('/', '_') or 'root'}"
+    try:
+        from pyinstrument import Profiler
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        response = await call_next(request)
+        profiler.stop()
+        path = os.path.join(PROFILE_DIR, f"{name}.html")
+        with open(path, "w") as f:
+            f.write(profiler.output_html())
+    except ImportError:
+        # cProfile sees the event loop thread only, including other requests it interleaves with
+        profiler = cProfile.Profile()
+        profiler.enable()
+        response = await call_next(request)
+        profiler.disable()
+        path = os.path.join(PROFILE_DIR, f"{name}.prof")
+        profiler.dump_stats(path)
+    print(f"🔬 Profile written: {path}")
+    response.headers["X-Profile-Path"] = path
+    return response
+
+if PROFILING_ENABLED:
+    # Registered only when enabled so normal requests pay no middleware overhead
+    app.middleware("http")(profile_request)
+
 # Security
 security = HTTPBearer()
 
 # Database setup
+PROCESS_STARTED_AT = time.perf_counter()
+MONGO_URL = os.getenv("MONGO_URL")
+DB_CONNECT_TIMEOUT_MS = int(os.getenv("DB_CONNECT_TIMEOUT_MS", "5000"))
+DB_RETRY_INITIAL_SECONDS = float(os.getenv("DB_RETRY_INITIAL_SECONDS", "1"))
+DB_RETRY_MAX_SECONDS = float(os.getenv("DB_RETRY_MAX_SECONDS", "30"))
+DB_RETRY_AFTER_SECONDS = 5
+# While MongoDB is configured but not reachable yet: "refuse" requests with 503,
+# or serve from "memory" (data written before the switch is not carried over)
+DB_UNAVAILABLE_MODE = os.getenv("DB_UNAVAILABLE_MODE", "refuse").lower()
+
 db = None
-users_collection = None
-documents_collection = None
-responses_collection = None
 
-try:
-    # MongoDB connection
-    MONGO_URL = os.getenv("MONGO_URL")
-    if not MONGO_URL:
-        raise Exception("MONGO_URL not set in environment")
-
-    print(f"🔗 Connecting to MongoDB: {MONGO_URL.split('@')[-1] if '@' in MONGO_URL else MONGO_URL}")
-    
-    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=5000)
-    # Test connection
-    client.admin.command('ping')
-    print("✅ MongoDB connected successfully")
-    
-    db = client["lexibridge"]
-    
-    # Collections
-    users_collection = db["users"]
-    documents_collection = db["documents"]
-    responses_collection = db["responses"]
-    
-    # Create indexes
-    users_collection.create_index("email", unique=True)
-    users_collection.create_index("username", unique=True)
-    documents_collection.create_index("userId")
-    responses_collection.create_index("userId")
-    
-    print("✅ Database collections initialized")
-    
-except Exception as e:
-    print(f"❌ MongoDB connection failed: {e}")
-    print("⚠️  Using in-memory database (data will be lost on restart)")
-    # Create in-memory collections as fallback
-    class InMemoryCollection:
-        def __init__(self):
-            self.data = []
-            self._id_counter = 1
-            
-        def _matches(self, item, query):
-            """Check if an item matches a query dict, supporting $or."""
-            for key, value in query.items():
-                if key == "$or":
-                    if not any(self._matches(item, sub) for sub in value):
-                        return False
-                elif key == "_id":
-                    if str(item.get("_id")) != str(value):
-                        return False
-                else:
-                    if item.get(key) != value:
-                        return False
-            return True
-
-        def find_one(self, query):
-            if query == {}:
-                return self.data[0] if self.data else None
-            for item in self.data:
-                if self._matches(item, query):
-                    return item
-            return None
-            
-        def insert_one(self, document):
-            document["_id"] = self._id_counter
-            self.data.append(document)
-            self._id_counter += 1
-            return type('obj', (object,), {'inserted_id': document["_id"]})()
-            
-        def find(self, query=None):
-            if query is None or query == {}:
-                return self.data.copy()
-            return [item for item in self.data if self._matches(item, query)]
-            
-        def update_one(self, query, update):
-            item = self.find_one(query)
-            if item:
-                if "$set" in update:
-                    item.update(update["$set"])
-                if "$push" in update:
-                    for key, value in update["$push"].items():
-                        if key not in item:
-                            item[key] = []
-                        item[key].append(value)
-            return type('obj', (object,), {'matched_count': 1 if item else 0})()
-            
-        def count_documents(self, query):
-            return len(self.find(query))
-    
-    users_collection = InMemoryCollection()
-    documents_collection = InMemoryCollection()
-    responses_collection = InMemoryCollection()
+class InMemoryCollection:
+    def __init__(self):
+        self.data = []
+        self._id_counter = 1
+        
+    def _matches(self, item, query):
+        """Check if an item matches a query dict, supporting $or."""
+        for key, value in query.items():
+            if key == "$or":
+                if not any(self._matches(item, sub) for sub in value):
+                    return False
+            elif key == "_id":
+                if str(item.get("_id")) != str(value):
+                    return False
+            elif isinstance(value, dict) and any(op.startswith("$") for op in value):
+                if not self._matches_operators(item.get(key), value):
+                    return False
+            else:
+                if item.get(key) != value:
+                    return False
+        return True
+
+    def _matches_operators(self, field_value, operators):
+        """Support the comparison operators used by range queries."""
+        for op, operand in operators.items():
+            if field_value is None and op != "$in":
+                return False
+            if op == "$gte" and not field_value >= operand:
+                return False
+            if op == "$gt" and not field_value > operand:
+                return False
+            if op == "$lte" and not field_value <= operand:
+                return False
+            if op == "$lt" and not field_value < operand:
+                return False
+            if op == "$in" and field_value not in operand:
+                return False
+        return True
+
+    def _project(self, item, projection):
+        """Apply an inclusion projection like {"field": 1}."""
+        if not projection:
+            return item
+        fields = {key for key, value in projection.items() if value}
+        return {key: value for key, value in item.items() if key in fields or key == "_id"}
+
+    def find_one(self, query, projection=None):
+        if query == {}:
+            return self._project(self.data[0], projection) if self.data else None
+        for item in self.data:
+            if self._matches(item, query):
+                return self._project(item, projection)
+        return None
+        
+    def insert_one(self, document):
+        document["_id"] = self._id_counter
+        self.data.append(document)
+        self._id_counter += 1
+        return type('obj', (object,), {'inserted_id': document["_id"]})()
+
+    def insert_many(self, documents):
+        ids = [self.insert_one(document).inserted_id for document in documents]
+        return type('obj', (object,), {'inserted_ids': ids})()
+        
+    def find(self, query=None, projection=None):
+        if query is None or query == {}:
+            return [self._project(item, projection) for item in self.data]
+        return [self._project(item, projection) for item in self.data if self._matches(item, query)]
+        
+    def update_one(self, query, update):
+        item = self.find_one(query)
+        if item:
+            if "$set" in update:
+                item.update(update["$set"])
+            if "$push" in update:
+                for key, value in update["$push"].items():
+                    if key not in item:
+                        item[key] = []
+                    item[key].append(value)
+        return type('obj', (object,), {'matched_count': 1 if item else 0})()
+        
+    def count_documents(self, query):
+        return len(self.find(query))
+
+class DatabaseUnavailable(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=503,
+            detail="Database is not available yet, please retry shortly",
+            headers={"Retry-After": str(DB_RETRY_AFTER_SECONDS)}
+        )
+
+class DatabaseState:
+    """Tracks which store serves requests and connects to MongoDB in the background"""
+
+    def __init__(self):
+        self.status = "connecting" if MONGO_URL else "in-memory"
+        self.attempts = 0
+        self.last_error = None
+        self.connected_after_ms = None
+        self.index_errors = {}  # index name -> error class; the database is usable without them
+        self.memory = {name: InMemoryCollection() for name in ("users", "documents", "responses", "document_pages")}
+
+    def collection(self, name: str):
+        if db is not None:
+            return db[name]
+        if self.status == "in-memory" or DB_UNAVAILABLE_MODE == "memory":
+            return self.memory[name]
+        raise DatabaseUnavailable()
+
+    def _connect(self):
+        """Blocking connect, ping and index creation (run in a worker thread)"""
+        global db
+        client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=DB_CONNECT_TIMEOUT_MS)
+        try:
+            client.admin.command('ping')
+            database = client["lexibridge"]
+            self.index_errors = self._create_indexes(database)
+        except BaseException:
+            # Connectivity failure: close the client (and its monitor threads) before the next retry
+            client.close()
+            raise
+        db = database
+
+    @staticmethod
+    def _create_indexes(database) -> dict:
+        """Create indexes one by one; server-side failures (e.g. duplicate keys) are reported, not retried"""
+        indexes = [
+            ("users", "email", {"unique": True}),
+            ("users", "username", {"unique": True}),
+            ("documents", "userId", {}),
+            ("responses", "userId", {}),
+            ("document_pages", [("documentId", 1), ("page", 1)], {}),
+            ("documents", [("documentName", "text"), ("documentContent", "text"), ("aiSummary", "text")],
+             {"name": "documents_text_search"}),
+            ("responses", [("userMessage", "text"), ("aiResponse", "text")], {"name": "responses_text_search"}),
+        ]
+        failed = {}
+        for collection, keys, options in indexes:
+            try:
+                database[collection].create_index(keys, **options)
+            except errors.OperationFailure as e:
+                name = options.get("name") or (keys if isinstance(keys, str) else "_".join(k for k, _ in keys))
+                failed[f"{collection}.{name}"] = type(e).__name__
+                print(f"⚠️  Could not create index {collection}.{name}: {e}")
+        return failed
+
+    async def connect_with_retry(self):
+        """Retry the MongoDB connection with exponential backoff until it succeeds"""
+        print(f"🔗 Connecting to MongoDB: {MONGO_URL.split('@')[-1] if '@' in MONGO_URL else MONGO_URL}")
+        delay = DB_RETRY_INITIAL_SECONDS
+        while db is None:
+            self.attempts += 1
+            try:
+                await asyncio.to_thread(self._connect)
+            except Exception as e:
+                self.last_error = type(e).__name__  # full text (with host names) only goes to the log
+                print(f"❌ MongoDB connection attempt {self.attempts} failed: {e} (retrying in {delay:g}s)")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, DB_RETRY_MAX_SECONDS)
+                continue
+            self.status = "connected"
+            self.last_error = None
+            self.connected_after_ms = round((time.perf_counter() - PROCESS_STARTED_AT) * 1000, 1)
+            if DB_UNAVAILABLE_MODE == "memory" and any(c.data for c in self.memory.values()):
+                print("⚠️  Switched to MongoDB; data written to the in-memory store before the switch was not carried over")
+            print(f"✅ MongoDB connected successfully (attempt {self.attempts}, {self.connected_after_ms}ms after start)")
+
+    def health(self) -> dict:
+        return {
+            "status": self.status,
+            "attempts": self.attempts,
+            "lastError": self.last_error,
+            "connectedAfterMs": self.connected_after_ms,
+            "indexErrors": self.index_errors or None,
+            "unavailableMode": DB_UNAVAILABLE_MODE if MONGO_URL else None
+        }
+
+database_state = DatabaseState()
+if not MONGO_URL:
+    print("⚠️  MONGO_URL not set, using in-memory database (data will be lost on restart)")
+
+class CollectionProxy:
+    """Forwards collection calls to whichever store is currently active"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(database_state.collection(self.name), attr)
+
+users_collection = CollectionProxy("users")
+documents_collection = CollectionProxy("documents")
+responses_collection = CollectionProxy("responses")
+document_pages_collection = CollectionProxy("document_pages")
+
+# Fast JSON responses with compression and conditional GET
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+DOCUMENT_VERSION_FIELDS = {"userId": 1, "updatedAt": 1, "createdAt": 1, "pageCount": 1}
+
+def dumps_json(content) -> bytes:
+    """Serialise a response payload, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(jsonable_encoder(content)).encode('utf-8')
+
+ETAG_CODING_SUFFIXES = ("-br", "-gzip")
+
+def make_etag(*parts) -> str:
+    """Strong ETag from the values that identify a resource version (identity coding)"""
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode('utf-8')).hexdigest()[:32]
+    return f'"{digest}"'
+
+def encoded_etag(etag: str, coding: str) -> str:
+    """Strong ETags must differ per content coding (RFC 9110 8.8.1): "<hash>" becomes "<hash>-br" """
+    return f'{etag[:-1]}-{coding}"'
+
+def _etag_candidates(request: Request) -> list:
+    header = request.headers.get("if-none-match")
+    return [tag.strip().removeprefix("W/") for tag in header.split(",")] if header else []
+
+def _etag_base(tag: str) -> str:
+    for suffix in ETAG_CODING_SUFFIXES:
+        if tag.endswith(f'{suffix}"'):
+            return f'{tag[:-len(suffix) - 1]}"'
+    return tag
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match covers any coding of the given ETag"""
+    candidates = _etag_candidates(request)
+    return "*" in candidates or any(_etag_base(tag) == etag for tag in candidates)
+
+def accepted_encodings(request: Request) -> set:
+    """Content codings the client accepts (ignoring q=0)"""
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.lower())
+    return accepted
+
+def cache_headers(etag: Optional[str]) -> dict:
+    headers = {"Cache-Control": "private, no-cache", "Vary": "Accept-Encoding, Authorization"}
+    if etag:
+        headers["ETag"] = etag
+    return headers
+
+def not_modified_response(request: Request, etag: str) -> Response:
+    """304 carrying the validator the client already holds (it names the coding it received)"""
+    matched = next((tag for tag in _etag_candidates(request) if _etag_base(tag) == etag), etag)
+    return Response(status_code=304, headers=cache_headers(matched))
+
+def fast_json_response(request: Request, content, etag: Optional[str] = None) -> Response:
+    """JSON response serialised with orjson, compressed above COMPRESSION_MIN_BYTES"""
+    body = dumps_json(content)
+    headers = cache_headers(etag)
+    if len(body) >= COMPRESSION_MIN_BYTES:
+        encodings = accepted_encodings(request)
+        if brotli is not None and "br" in encodings:
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in encodings:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+        if etag and "Content-Encoding" in headers:
+            headers["ETag"] = encoded_etag(etag, headers["Content-Encoding"])
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def document_version(document: dict) -> str:
+    """Version marker for a document: updatedAt, falling back to createdAt"""
+    return str(document.get("updatedAt") or document.get("createdAt") or "")
 
 # API Keys
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")  # e.g. a local stub server for benchmarks
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGORITHM = "HS256"
 
+def create_groq_client() -> Groq:
+    """Groq client with SDK retries off: a timeout or 429 goes straight to the router's model fallback"""
+    return Groq(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL or None, max_retries=0)
+
 # Initialize Groq client
 groq_client = None
 if GROQ_API_KEY:
     try:
-        groq_client = Groq(api_key=GROQ_API_KEY)
+        groq_client = create_groq_client()
         print("✅ Groq client initialized successfully")
     except Exception as e:
         print(f"❌ Failed to initialize Groq client: {e}")
@@ -188,34 +577,797 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security))
         print(f"Token verification failed: {e}")
         raise HTTPException(status_code=401, detail="Invalid token")
 
-def extract_text_from_pdf(pdf_file: UploadFile) -> str:
-    """Extract text from uploaded PDF file"""
+def extract_pages_from_pdf(pdf_file: UploadFile) -> list:
+    """Extract per-page text (line breaks kept, spaces tidied) from uploaded PDF file"""
     try:
         # Create temporary file
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
             content = pdf_file.file.read()
             tmp_file.write(content)
             tmp_file_path = tmp_file.name
-        
-        # Extract text using PyMuPDF
-        text = ""
+
+        # Extract text using PyMuPDF, one entry per page
         doc = fitz.open(tmp_file_path)
-        for page in doc:
-            text += page.get_text()
+        pages = [clean_page_text(page.get_text()) for page in doc]
         doc.close()
-        
+
         # Clean up temporary file
         os.unlink(tmp_file_path)
-        
-        # Clean text
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text[:10000]  # Limit to 10000 characters for AI processing
+
+        return pages
     except Exception as e:
         print(f"PDF extraction error: {e}")
         raise HTTPException(status_code=400, detail=f"Error extracting text from PDF: {str(e)}")
 
-def analyze_document_with_ai(document_text: str, question: str = None) -> str:
-    """Analyze document with Groq AI"""
+extraction_semaphore = asyncio.Semaphore(EXTRACTION_MAX_CONCURRENT)
+
+def clean_page_text(text: str) -> str:
+    """Tidy a page's text while keeping its line structure"""
+    text = re.sub(r'[ \t\r\f\v]+', ' ', text)
+    text = re.sub(r' *\n *', '\n', text)
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+def join_pages(pages: list) -> tuple:
+    """Join page texts into one full text, returning (full_text, page start offsets)"""
+    offsets = []
+    position = 0
+    for page_text in pages:
+        offsets.append(position)
+        position += len(page_text) + 1  # joined with a newline
+    return "\n".join(pages), offsets
+
+def page_for_offset(offsets: list, offset: int) -> int:
+    """1-based page number containing a character offset of the joined text"""
+    return max(1, bisect.bisect_right(offsets, offset))
+
+def clean_extracted_text(text: str) -> str:
+    """Collapse whitespace and truncate extracted text for storage and AI processing"""
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text[:10000]  # Limit to 10000 characters for AI processing
+
+def extract_text_from_pdf(pdf_file: UploadFile) -> str:
+    """Extract text from uploaded PDF file"""
+    return clean_extracted_text("\n".join(extract_pages_from_pdf(pdf_file)))
+
+# Document fact extraction (fast local path, no AI call)
+FACTS_FAST_PATH_ENABLED = os.getenv("FACTS_FAST_PATH", "true").lower() not in ("0", "false", "no")
+MAX_FACTS_PER_TYPE = 50
+
+_MONTHS = r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)"
+
+DATE_PATTERNS = [
+    # March 1, 2024 / Mar. 1st 2024
+    (re.compile(rf"\b({_MONTHS})\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?,?\s+(\d{{4}})\b"), "mdy"),
+    # 1 March 2024 / 1st day of March, 2024
+    (re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:day\s+of\s+)?({_MONTHS})\.?,?\s+(\d{{4}})\b"), "dmy"),
+    # 2024-03-01
+    (re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b"), "iso"),
+    # 03/01/2024, 01.03.2024
+    (re.compile(r"\b(\d{1,2})[/.](\d{1,2})[/.](\d{4})\b"), "numeric"),
+]
+
+AMOUNT_PATTERNS = [
+    # $1,000.00 / USD 5,000 / Rs. 10,000 / €2.5 million
+    re.compile(
+        r"(?:(?P<symbol>US\$|[$€£₹])\s?|\b(?P<code>USD|EUR|GBP|INR|Rs\.?)\s?)"
+        r"(?P<number>\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+        r"(?:\s?(?P<scale>million|billion|thousand|lakh|crore)\b)?",
+        re.IGNORECASE
+    ),
+    # 5,000 dollars / 200 rupees
+    re.compile(
+        r"\b(?P<number>\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+        r"(?:\s?(?P<scale>million|billion|thousand|lakh|crore))?"
+        r"\s+(?P<word>dollars|euros|pounds|rupees)\b",
+        re.IGNORECASE
+    ),
+]
+
+_PARTY_NAME = r"[A-Z][\w&.,'’-]*(?:\s+(?:[A-Z][\w&.,'’-]*|of|and|&|de|la)){0,8}"
+
+PARTY_ROLE_PATTERN = re.compile(
+    rf"({_PARTY_NAME})\s*,?\s*\(\s*(?:hereinafter\s+(?:referred\s+to\s+as\s+)?|the\s+)?[\"“']?(?:the\s+)?([A-Z][A-Za-z]+(?:\s[A-Z][A-Za-z]+)?)[\"”']?\s*\)"
+)
+PARTY_BETWEEN_PATTERN = re.compile(
+    rf"\bbetween\s+({_PARTY_NAME}?)\s*(?:,|\(|\s+and\s+)(?:[^.]{{0,200}}?\s+and\s+)?({_PARTY_NAME}?)\s*(?:,|\(|\.|$)"
+)
+
+CLAUSE_HEADING_PATTERNS = [
+    # "5. Termination" / "5.1 Payment Terms:" / "Section 5 - Termination" on their own line
+    re.compile(
+        r"^[ \t]*(?:(?:Section|Article|Clause|SECTION|ARTICLE|CLAUSE)\s+)?(\d+(?:\.\d+)*|[IVXLC]+)[.):]?[ \t]+(?:[-–—][ \t]+)?([A-Z][A-Za-z ,&/'-]{2,60}?)[ \t]*[.:]?[ \t]*$",
+        re.MULTILINE
+    ),
+    # "ARTICLE IV" / "CONFIDENTIALITY" style all-caps headings on their own line
+    re.compile(r"^[ \t]*()([A-Z][A-Z &,/'-]{3,60})[ \t]*$", re.MULTILINE),
+    # Inline "Section 5. Termination" inside collapsed text
+    re.compile(r"\b(?:Section|Article|Clause)\s+(\d+(?:\.\d+)*)\s*[.:–—-]?\s+([A-Z][a-z]+(?:\s+(?:[A-Z][a-z]+|and|of|&)){0,4})"),
+]
+
+CLAUSE_CATEGORIES = {
+    "termination": ("terminat", "cancel", "expir"),
+    "payment": ("payment", "fee", "compensation", "price", "rent", "invoice"),
+    "confidentiality": ("confidential", "non-disclosure", "nondisclosure"),
+    "liability": ("liabilit", "indemn", "warrant"),
+    "dispute_resolution": ("dispute", "arbitration", "governing law", "jurisdiction"),
+    "term": ("term", "duration", "effective date"),
+    "non_compete": ("non-compet", "noncompet", "non-solicit"),
+}
+
+_AMOUNT_SCALES = {"thousand": 1e3, "lakh": 1e5, "million": 1e6, "crore": 1e7, "billion": 1e9}
+_CURRENCY_CODES = {
+    "$": "USD", "us$": "USD", "usd": "USD", "dollars": "USD",
+    "€": "EUR", "eur": "EUR", "euros": "EUR",
+    "£": "GBP", "gbp": "GBP", "pounds": "GBP",
+    "₹": "INR", "inr": "INR", "rs": "INR", "rs.": "INR", "rupees": "INR",
+}
+
+def _fact_context(text: str, start: int, end: int, width: int = 60) -> str:
+    """Return a whitespace-collapsed snippet of text around a match"""
+    snippet = text[max(0, start - width):min(len(text), end + width)]
+    return re.sub(r'\s+', ' ', snippet).strip()
+
+def _parse_date_match(match, kind: str) -> Optional[str]:
+    """Convert a date regex match to an ISO date string, or None if ambiguous/invalid"""
+    try:
+        if kind == "mdy":
+            month, day, year = match.group(1), match.group(2), match.group(3)
+            return datetime.strptime(f"{month[:3]} {day} {year}", "%b %d %Y").date().isoformat()
+        if kind == "dmy":
+            day, month, year = match.group(1), match.group(2), match.group(3)
+            return datetime.strptime(f"{month[:3]} {day} {year}", "%b %d %Y").date().isoformat()
+        if kind == "iso":
+            return datetime.strptime(match.group(0), "%Y-%m-%d").date().isoformat()
+        if kind == "numeric":
+            first, second, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
+            # Only resolve when day/month order is unambiguous
+            if first > 12 >= second:
+                return datetime(year, second, first).date().isoformat()
+            if second > 12 >= first:
+                return datetime(year, first, second).date().isoformat()
+            return None
+    except ValueError:
+        return None
+    return None
+
+def extract_dates(text: str) -> list:
+    """Find dates in document text"""
+    found = {}
+    for pattern, kind in DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            key = match.start()
+            if key in found:
+                continue
+            found[key] = {
+                "text": match.group(0),
+                "value": _parse_date_match(match, kind),
+                "offset": match.start(),
+                "context": _fact_context(text, match.start(), match.end())
+            }
+    return [found[k] for k in sorted(found)][:MAX_FACTS_PER_TYPE]
+
+def extract_amounts(text: str) -> list:
+    """Find monetary amounts in document text"""
+    found = {}
+    for pattern in AMOUNT_PATTERNS:
+        for match in pattern.finditer(text):
+            if match.start() in found:
+                continue
+            groups = match.groupdict()
+            currency_key = (groups.get("symbol") or groups.get("code") or groups.get("word") or "").lower()
+            try:
+                value = float(groups["number"].replace(",", ""))
+            except ValueError:
+                continue
+            if groups.get("scale"):
+                value *= _AMOUNT_SCALES[groups["scale"].lower()]
+            found[match.start()] = {
+                "text": match.group(0).strip(),
+                "value": value,
+                "currency": _CURRENCY_CODES.get(currency_key),
+                "offset": match.start(),
+                "context": _fact_context(text, match.start(), match.end())
+            }
+    return [found[k] for k in sorted(found)][:MAX_FACTS_PER_TYPE]
+
+def extract_parties(text: str) -> list:
+    """Find contracting parties (defined-role parties and "between X and Y")"""
+    parties = []
+    seen = set()
+
+    def add(name, role, offset):
+        name = re.sub(r'\s+', ' ', name).strip(" ,.;")
+        if len(name) < 2 or name.lower() in seen:
+            return
+        seen.add(name.lower())
+        parties.append({"name": name, "role": role, "offset": offset})
+
+    for match in PARTY_ROLE_PATTERN.finditer(text):
+        add(match.group(1), match.group(2).strip(), match.start(1))
+    for match in PARTY_BETWEEN_PATTERN.finditer(text):
+        add(match.group(1), None, match.start(1))
+        if match.group(2):
+            add(match.group(2), None, match.start(2))
+    return sorted(parties, key=lambda p: p["offset"])[:MAX_FACTS_PER_TYPE]
+
+def categorize_clause(heading: str) -> Optional[str]:
+    """Map a clause heading to a known clause category"""
+    lowered = heading.lower()
+    for category, keywords in CLAUSE_CATEGORIES.items():
+        if any(keyword in lowered for keyword in keywords):
+            return category
+    return None
+
+def extract_clauses(text: str) -> list:
+    """Find clause headings with their offsets"""
+    found = {}
+    for pattern in CLAUSE_HEADING_PATTERNS:
+        for match in pattern.finditer(text):
+            heading = re.sub(r'\s+', ' ', match.group(2)).strip(" ,.:-")
+            if len(heading) < 3 or match.start(2) in found:
+                continue
+            found[match.start(2)] = {
+                "number": match.group(1) or None,
+                "heading": heading,
+                "category": categorize_clause(heading),
+                "offset": match.start(2)
+            }
+    return [found[k] for k in sorted(found)][:MAX_FACTS_PER_TYPE]
+
+def extract_document_facts(text: str, page_offsets: list = None) -> dict:
+    """Run the local rule-based extractors over the full document text"""
+    started = time.perf_counter()
+    facts = {
+        "dates": extract_dates(text),
+        "amounts": extract_amounts(text),
+        "parties": extract_parties(text),
+        "clauses": extract_clauses(text),
+    }
+    if page_offsets:
+        for fact_type in ("dates", "amounts", "parties", "clauses"):
+            for item in facts[fact_type]:
+                item["page"] = page_for_offset(page_offsets, item["offset"])
+    facts["stats"] = {
+        "characters": len(text),
+        "extractionMs": round((time.perf_counter() - started) * 1000, 3),
+        "extractedAt": datetime.utcnow()
+    }
+    return facts
+
+# Explicit requests for a whole fact list, e.g. "list all the dates" or "who are the parties".
+# Patterns must match the entire question; anything with further qualifiers goes to the model.
+_FACT_LIST_PREFIX = r"(?:please )?(?:(?:can|could) you )?(?:list|show(?: me)?|give me|tell me|what are|which are|find)"
+_FACT_LIST_SUFFIX = r"(?: (?:in|from|of|to|mentioned in|listed in|named in) (?:this|the) (?:document|contract|agreement|pdf|file))?"
+
+def _fact_list_pattern(nouns: str, extra: str = None) -> re.Pattern:
+    pattern = rf"{_FACT_LIST_PREFIX} (?:all )?(?:of )?(?:the )?(?:key |important |main )?(?:{nouns}){_FACT_LIST_SUFFIX}"
+    if extra:
+        pattern = rf"{pattern}|{extra}"
+    return re.compile(rf"(?:{pattern})")
+
+FACT_QUESTION_PATTERNS = [
+    ("dates", _fact_list_pattern(r"dates|deadlines|dates and deadlines")),
+    ("amounts", _fact_list_pattern(r"amounts|monetary amounts|sums|fees|payments|dollar amounts")),
+    ("parties", _fact_list_pattern(
+        r"parties|parties involved",
+        rf"who (?:are|is) (?:all )?the parties(?: involved)?{_FACT_LIST_SUFFIX}"
+    )),
+    ("clauses", _fact_list_pattern(r"clauses|sections|headings|clauses and sections")),
+]
+
+def classify_fact_question(question: str) -> Optional[str]:
+    """Return the fact type an explicit list request asks for, or None"""
+    normalized = " ".join(re.sub(r"[^\w\s']", " ", question.lower()).split())
+    if not normalized:
+        return None
+    for fact_type, pattern in FACT_QUESTION_PATTERNS:
+        if pattern.fullmatch(normalized):
+            return fact_type
+    return None
+
+def answer_from_facts(question: str, facts: dict) -> Optional[str]:
+    """Build a markdown answer from extracted facts, or None if they can't answer it"""
+    fact_type = classify_fact_question(question)
+    if not fact_type or not facts or not facts.get(fact_type):
+        return None
+
+    items = facts[fact_type]
+    cite = lambda item: f" (p. {item['page']})" if item.get("page") else ""
+    if fact_type == "dates":
+        lines = [f"- **{d['text']}**" + (f" ({d['value']})" if d.get("value") else "") + f" — _{d['context']}_{cite(d)}" for d in items]
+        title = "Dates Found in the Document"
+    elif fact_type == "amounts":
+        lines = [f"- **{a['text']}**" + (f" ({a['currency']})" if a.get("currency") else "") + f" — _{a['context']}_{cite(a)}" for a in items]
+        title = "Monetary Amounts Found in the Document"
+    elif fact_type == "parties":
+        lines = [f"- **{p['name']}**" + (f" — {p['role']}" if p.get("role") else "") + cite(p) for p in items]
+        title = "Parties Identified in the Document"
+    else:
+        lines = ["- " + (f"{c['number']}. " if c.get("number") else "") + f"**{c['heading']}**" + cite(c) for c in items]
+        title = "Clauses and Sections in the Document"
+
+    return f"""## {title}
+
+""" + "\n".join(lines) + """
+
+_Answered instantly from facts extracted locally from the document. Ask a more detailed question for a full AI interpretation._
+
+**Disclaimer:** I am an AI assistant and not a lawyer. This information is for educational purposes only and does not constitute legal advice."""
+
+# Rephrased-question cache (per document version). Questions are reduced to a set of stemmed
+# content words; two questions share an answer only if those sets are identical. Wording, word
+# order, stopwords, inflection and the synonyms below may differ, but no content word may: in
+# legal Q&A "water" vs "fire" damage or "landlord" vs "tenant" changes the answer, so fuzzy
+# (MinHash-style) matching on the remaining words is deliberately not used.
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "true").lower() not in ("0", "false", "no")
+ANSWER_CACHE_MAX_DOCUMENTS = int(os.getenv("ANSWER_CACHE_MAX_DOCUMENTS", "1000"))
+ANSWER_CACHE_MAX_PER_DOCUMENT = int(os.getenv("ANSWER_CACHE_MAX_PER_DOCUMENT", "100"))
+
+# Pronouns and role nouns (we/they/my, landlord/tenant) are deliberately kept: they change the answer
+QUESTION_STOPWORDS = frozenset("""
+a about an and any are as at be been being but by can could do does did for from had has have how if in into
+is it its of on or please shall should tell than that the then there these this those to was were what whats
+which will with would document contract agreement
+""".split())
+# Question words that carry meaning map onto the noun a rephrased question would use
+QUESTION_SYNONYMS = {"when": "date", "deadline": "date", "much": "amount", "cost": "amount", "price": "amount", "sum": "amount"}
+
+def stem_word(word: str) -> str:
+    """Very small suffix-stripping stemmer (terminate/termination/terminating -> termin)"""
+    for suffix in ("ational", "ation", "ition", "ments", "ment", "ness", "ings", "ing", "ated", "ates", "ate",
+                   "ies", "ied", "ed", "es", "ly", "s", "e"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+def normalize_question(question: str) -> list:
+    """Lowercase, strip punctuation and stopwords, and stem a question into tokens"""
+    words = re.findall(r"[a-z0-9]+", question.lower().replace("'", ""))
+    return [stem_word(QUESTION_SYNONYMS.get(w, w)) for w in words
+            if w not in QUESTION_STOPWORDS and (len(w) > 1 or w == "i")]
+
+def question_key(question: str) -> Optional[frozenset]:
+    """Cache key for a question: its set of normalised content words, or None if it has none"""
+    tokens = normalize_question(question)
+    return frozenset(tokens) if tokens else None
+
+class QuestionAnswerCache:
+    """
+    Per-document answer cache keyed on question_key(), so rephrasings of the same
+    question ("when does this terminate?" / "termination date?") share an answer.
+    Documents and per-document entries are evicted least recently used.
+    """
+
+    def __init__(self, max_documents: int, max_per_document: int):
+        self.max_documents = max_documents
+        self.max_per_document = max_per_document
+        self._documents = OrderedDict()  # (documentId, contentHash) -> OrderedDict(question key -> entry)
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def lookup(self, document_key: tuple, question: str) -> Optional[dict]:
+        """Return {"answer", "question"} cached for a rephrasing of this question, or None"""
+        key = question_key(question)
+        with self._lock:
+            self.stats["lookups"] += 1
+            entries = self._documents.get(document_key)
+            entry = entries.get(key) if entries is not None and key is not None else None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._documents.move_to_end(document_key)
+            entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return dict(entry)
+
+    def store(self, document_key: tuple, question: str, answer: str):
+        """Cache an answer for a question against a document version"""
+        key = question_key(question)
+        if key is None:
+            return
+        with self._lock:
+            entries = self._documents.get(document_key)
+            if entries is None:
+                entries = self._documents[document_key] = OrderedDict()
+                if len(self._documents) > self.max_documents:
+                    self._documents.popitem(last=False)
+                    self.stats["evictions"] += 1
+            self._documents.move_to_end(document_key)
+            entries[key] = {"answer": answer, "question": question}
+            entries.move_to_end(key)
+            if len(entries) > self.max_per_document:
+                entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            self.stats["stores"] += 1
+
+    def metrics(self) -> dict:
+        """Hit-rate metrics for the cache"""
+        with self._lock:
+            lookups = self.stats["lookups"]
+            return {
+                **self.stats,
+                "hitRate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+                "documents": len(self._documents),
+                "entries": sum(len(entries) for entries in self._documents.values())
+            }
+
+answer_cache = QuestionAnswerCache(ANSWER_CACHE_MAX_DOCUMENTS, ANSWER_CACHE_MAX_PER_DOCUMENT)
+
+def document_cache_key(document: dict) -> tuple:
+    """Cache key for a document version: its id plus a hash of its content"""
+    content_hash = hashlib.sha256(document.get("documentContent", "").encode('utf-8')).hexdigest()
+    return (str(document["_id"]), content_hash)
+
+# Full-text search (MongoDB text index, or a local inverted index on the in-memory store)
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+SEARCH_SNIPPET_WIDTH = 80
+SEARCH_STOPWORDS = QUESTION_STOPWORDS - {"document", "contract", "agreement"}
+SEARCH_FIELDS = {
+    "document": ("documentName", "documentContent", "aiSummary"),
+    "response": ("userMessage", "aiResponse"),
+}
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+def search_tokens(text: str) -> list:
+    """Tokenise text for the local search index (lowercase, stopwords removed, stemmed)"""
+    return [stem_word(w) for w in re.findall(r"[a-z0-9]+", text.lower()) if len(w) > 1 and w not in SEARCH_STOPWORDS]
+
+class InvertedSearchIndex:
+    """Per-user inverted index with BM25 ranking and incremental updates"""
+
+    def __init__(self):
+        self._users = {}  # userId -> {"postings": {token: {key: tf}}, "entries": {key: entry}, "totalLength": int}
+        self._lock = threading.Lock()
+
+    def _remove(self, user, key):
+        entry = user["entries"].pop(key, None)
+        if not entry:
+            return
+        for token in entry["tf"]:
+            postings = user["postings"].get(token)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del user["postings"][token]
+        user["totalLength"] -= entry["length"]
+
+    def upsert(self, kind: str, item: dict):
+        """Add or re-index a document or response for its owner"""
+        user_id = str(item.get("userId"))
+        key = (kind, str(item["_id"]))
+        tf = {}
+        for field in SEARCH_FIELDS[kind]:
+            for token in search_tokens(item.get(field) or ""):
+                tf[token] = tf.get(token, 0) + 1
+        entry = {"kind": kind, "item": item, "tf": tf, "length": sum(tf.values())}
+        with self._lock:
+            user = self._users.setdefault(user_id, {"postings": {}, "entries": {}, "totalLength": 0})
+            self._remove(user, key)
+            user["entries"][key] = entry
+            user["totalLength"] += entry["length"]
+            for token, count in tf.items():
+                user["postings"].setdefault(token, {})[key] = count
+
+    def search(self, user_id: str, query: str) -> list:
+        """Return [(score, entry)] matching all query terms, best first"""
+        terms = list(dict.fromkeys(search_tokens(query)))
+        with self._lock:
+            user = self._users.get(str(user_id))
+            if not user or not terms:
+                return []
+            postings = [user["postings"].get(term, {}) for term in terms]
+            if not all(postings):
+                return []
+            postings.sort(key=len)
+            keys = set(postings[0])
+            for other in postings[1:]:
+                keys &= other.keys()
+
+            total = len(user["entries"])
+            average_length = user["totalLength"] / total if total else 1
+            results = []
+            for key in keys:
+                entry = user["entries"][key]
+                score = 0.0
+                for term_postings in postings:
+                    tf = term_postings[key]
+                    idf = math.log(1 + (total - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+                    norm = tf + _BM25_K1 * (1 - _BM25_B + _BM25_B * entry["length"] / (average_length or 1))
+                    score += idf * tf * (_BM25_K1 + 1) / norm
+                results.append((score, entry))
+        results.sort(key=lambda r: r[0], reverse=True)
+        return results
+
+search_index = InvertedSearchIndex()
+
+def index_for_search(kind: str, item: dict):
+    """Incrementally update the local search index (MongoDB uses its own text index)"""
+    if db is not None:
+        return
+    try:
+        search_index.upsert(kind, item)
+    except Exception as e:
+        print(f"⚠️  Failed to update search index: {e}")
+
+def search_snippets(item: dict, fields: tuple, query: str) -> list:
+    """Build HTML-escaped snippets around query terms, with matches wrapped in <mark>"""
+    stems = [re.escape(t) for t in dict.fromkeys(search_tokens(query))]
+    if not stems:
+        return []
+    pattern = re.compile(r"\b(?:" + "|".join(stems) + r")\w*", re.IGNORECASE)
+    snippets = []
+    for field in fields:
+        text = item.get(field) or ""
+        match = pattern.search(text)
+        if not match:
+            continue
+        start = max(0, match.start() - SEARCH_SNIPPET_WIDTH)
+        end = min(len(text), match.end() + SEARCH_SNIPPET_WIDTH)
+        window = text[start:end]
+        highlighted, last = "", 0
+        for m in pattern.finditer(window):
+            highlighted += html.escape(window[last:m.start()]) + "<mark>" + html.escape(m.group(0)) + "</mark>"
+            last = m.end()
+        highlighted += html.escape(window[last:])
+        snippets.append({
+            "field": field,
+            "text": ("…" if start > 0 else "") + re.sub(r'\s+', ' ', highlighted).strip() + ("…" if end < len(text) else "")
+        })
+    return snippets
+
+def encode_search_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode()).decode().rstrip("=")
+
+def decode_search_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return max(0, int(json.loads(base64.urlsafe_b64decode(padded))["o"]))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid search cursor")
+
+def mongo_text_query(query: str) -> str:
+    """
+    Unquoted terms for MongoDB $text, so it stems them like the local index does
+    ("terminate" finds "termination"). Quoted terms would be exact phrase matches;
+    unquoted ones match any term, so search_user_content keeps only items with all of them.
+    """
+    terms = [t for t in re.findall(r"[\w'-]+", query) if t.lower() not in SEARCH_STOPWORDS]
+    return " ".join(terms)
+
+def has_all_search_terms(item: dict, fields: tuple, terms: set) -> bool:
+    """Whether an item contains every (stemmed) query term in the given fields"""
+    tokens = set()
+    for field in fields:
+        tokens.update(search_tokens(item.get(field) or ""))
+    return terms <= tokens
+
+def search_user_content(user_id: str, query: str, offset: int, limit: int) -> tuple:
+    """Return ([(score, kind, item)], has_more) for a user's documents and responses"""
+    wanted = offset + limit + 1
+    if db is None:
+        ranked = [(score, entry["kind"], entry["item"]) for score, entry in search_index.search(user_id, query)]
+    else:
+        text_query = mongo_text_query(query)
+        terms = set(search_tokens(query))
+        if not text_query or not terms:
+            return [], False
+        ranked = []
+        for kind, collection in (("document", documents_collection), ("response", responses_collection)):
+            cursor = collection.find(
+                {"userId": user_id, "$text": {"$search": text_query}},
+                {"score": {"$meta": "textScore"}}
+            ).sort([("score", {"$meta": "textScore"})])
+            matched = 0
+            for item in cursor:
+                if not has_all_search_terms(item, SEARCH_FIELDS[kind], terms):
+                    continue
+                ranked.append((item.get("score", 0.0), kind, item))
+                matched += 1
+                if matched >= wanted:
+                    break
+        ranked.sort(key=lambda r: r[0], reverse=True)
+    page = ranked[offset:offset + limit]
+    return page, len(ranked) > offset + limit
+
+# Model routing (task type, input size, latency/cost target) with fallback
+DEFAULT_LLM_MODELS = [
+    {"name": "openai/gpt-oss-120b", "tier": "large", "maxInputTokens": 120000, "costPerMillionTokens": 0.45, "expectedLatencyMs": 4000},
+    {"name": "openai/gpt-oss-20b", "tier": "small", "maxInputTokens": 120000, "costPerMillionTokens": 0.30, "expectedLatencyMs": 1500},
+    {"name": "llama-3.1-8b-instant", "tier": "small", "maxInputTokens": 120000, "costPerMillionTokens": 0.07, "expectedLatencyMs": 800},
+]
+LLM_DEFAULT_MODEL = os.getenv("LLM_DEFAULT_MODEL", "openai/gpt-oss-120b")
+LLM_ROUTING_ENABLED = os.getenv("LLM_ROUTING", "true").lower() not in ("0", "false", "no")
+LLM_ROUTING_TARGET = os.getenv("LLM_ROUTING_TARGET", "balanced")  # balanced | latency | cost | quality
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+# Only short lookup questions over short documents go to the small tier; everything else uses the large one.
+# The document limit applies to the whole document, not the prompt (which is capped at 3000 characters).
+SIMPLE_QUESTION_MAX_DOCUMENT_TOKENS = int(os.getenv("SIMPLE_QUESTION_MAX_DOCUMENT_TOKENS", "600"))
+SIMPLE_QUESTION_MAX_WORDS = 12
+SIMPLE_QUESTION_LEAD = re.compile(
+    r"^(?:what(?:'s| is| are)|who(?:'s| is| are)|when (?:is|was|does|do)|where (?:is|are)|how (?:much|many|long)"
+    r"|is there|are there|does (?:it|this|the)|name)\b"
+)
+COMPLEX_QUESTION_MARKERS = re.compile(
+    r"[,;]|\b(?:if|unless|whether|and|or|but|because|otherwise|should|could|would|might|happens?|liab\w*"
+    r"|breach\w*|enforc\w*|risks?|risky|fair|unfair|rights?|obligations?|advise|explain|compare|why|mean)\b"
+)
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+LLM_MODELS = DEFAULT_LLM_MODELS
+if os.getenv("LLM_MODELS_JSON"):
+    try:
+        LLM_MODELS = json.loads(os.getenv("LLM_MODELS_JSON")) or DEFAULT_LLM_MODELS
+    except ValueError:
+        print("⚠️  Invalid LLM_MODELS_JSON, using default model catalog")
+
+model_stats = {}
+model_stats_lock = threading.Lock()
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about 4 characters per token)"""
+    return max(1, len(text) // 4)
+
+def document_size_tokens(document: dict) -> Optional[int]:
+    """Estimated tokens in a whole stored document (documentContent is truncated, page offsets are not)"""
+    if not document:
+        return None
+    offsets = document.get("pageOffsets") or []
+    length = max(len(document.get("documentContent", "")), offsets[-1] if offsets else 0)
+    return max(1, length // 4)
+
+def is_simple_question(question: str) -> bool:
+    """Short single-clause lookup questions ("who is the tenant?") that a small model answers well"""
+    normalized = " ".join(re.sub(r"[^\w\s',;]", " ", (question or "").lower()).split())
+    return (
+        bool(normalized)
+        and len(normalized.split()) <= SIMPLE_QUESTION_MAX_WORDS
+        and bool(SIMPLE_QUESTION_LEAD.match(normalized))
+        and not COMPLEX_QUESTION_MARKERS.search(normalized)
+    )
+
+def _observed_latency_ms(model: dict) -> float:
+    """Observed median latency for a model, or its configured expectation"""
+    samples = model_stats.get(model["name"], {}).get("latencies")
+    return percentile(list(samples), 50) * 1000 if samples else model["expectedLatencyMs"]
+
+def route_models(task: str, input_tokens: int, question: str = None, target: str = None,
+                 document_tokens: int = None) -> list:
+    """
+    Return candidate model names in preference order; later entries are fallbacks.
+    input_tokens is the prompt size; document_tokens is the size of the whole
+    document the question is about (unknown counts as large).
+    """
+    if not LLM_ROUTING_ENABLED:
+        return [LLM_DEFAULT_MODEL]
+    target = target or LLM_ROUTING_TARGET
+    models = [m for m in LLM_MODELS if m.get("maxInputTokens", 0) >= input_tokens] or LLM_MODELS
+
+    simple = (
+        task == "question"
+        and document_tokens is not None
+        and document_tokens <= SIMPLE_QUESTION_MAX_DOCUMENT_TOKENS
+        and is_simple_question(question)
+    )
+    if target == "quality":
+        preferred_tier = "large"
+    elif simple or (target == "latency" and task == "question"):
+        preferred_tier = "small"
+    else:
+        preferred_tier = "large"
+
+    if target == "cost":
+        rank = lambda m: m["costPerMillionTokens"]
+    elif target == "latency":
+        rank = _observed_latency_ms
+    else:
+        # balanced/quality: cheapest suitable model first, latency as a tie-breaker
+        rank = lambda m: (m["costPerMillionTokens"], _observed_latency_ms(m))
+
+    preferred = sorted((m for m in models if m.get("tier") == preferred_tier), key=rank)
+    others = sorted((m for m in models if m.get("tier") != preferred_tier), key=rank)
+    if preferred_tier == "large" and LLM_DEFAULT_MODEL in {m["name"] for m in preferred}:
+        preferred.sort(key=lambda m: m["name"] != LLM_DEFAULT_MODEL)
+    return [m["name"] for m in preferred + others]
+
+def is_retryable_llm_error(error: Exception) -> bool:
+    """Timeouts, rate limits and transient upstream errors justify trying another model"""
+    if isinstance(error, (groq.APITimeoutError, groq.RateLimitError, groq.APIConnectionError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+def record_model_call(model: str, latency: float, usage=None, error: Exception = None, fallback: bool = False):
+    """Record per-model latency, token and outcome metrics"""
+    with model_stats_lock:
+        stats = model_stats.setdefault(model, {
+            "calls": 0, "failures": 0, "rateLimited": 0, "timeouts": 0, "fallbacksFrom": 0,
+            "promptTokens": 0, "completionTokens": 0, "latencies": deque(maxlen=LATENCY_SAMPLE_SIZE)
+        })
+        stats["calls"] += 1
+        stats["latencies"].append(latency)
+        if error is not None:
+            stats["failures"] += 1
+            if isinstance(error, groq.RateLimitError) or getattr(error, "status_code", None) == 429:
+                stats["rateLimited"] += 1
+            if isinstance(error, groq.APITimeoutError):
+                stats["timeouts"] += 1
+        if fallback:
+            stats["fallbacksFrom"] += 1
+        if usage is not None:
+            stats["promptTokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            stats["completionTokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+def model_metrics() -> dict:
+    """Per-model latency percentiles, token totals and throughput"""
+    with model_stats_lock:
+        result = {}
+        for name, stats in model_stats.items():
+            latencies = list(stats["latencies"])
+            busy_seconds = sum(latencies)
+            result[name] = {
+                **{k: v for k, v in stats.items() if k != "latencies"},
+                "latency": latency_summary(latencies),
+                "completionTokensPerSecond": round(stats["completionTokens"] / busy_seconds, 1) if busy_seconds else None
+            }
+        return {"routingEnabled": LLM_ROUTING_ENABLED, "target": LLM_ROUTING_TARGET, "models": result}
+
+# Per-page document retrieval
+MAX_PAGES_PER_REQUEST = int(os.getenv("MAX_PAGES_PER_REQUEST", "20"))
+PAGE_CONTEXT_CHARS = 3000
+CITED_PAGE_PATTERN = re.compile(r"\((?:p\.|page)\s*(\d+)\)", re.IGNORECASE)
+
+def fetch_document_pages(document: dict, start: int, end: int) -> list:
+    """Return stored pages start..end (1-based, inclusive) for a document"""
+    if not document.get("pageCount"):
+        # Documents uploaded before per-page storage: serve the stored content as page 1
+        if start > 1:
+            return []
+        return [{"page": 1, "text": document.get("documentContent", ""), "offset": 0}]
+    pages = document_pages_collection.find({
+        "documentId": str(document["_id"]),
+        "userId": document.get("userId"),
+        "page": {"$gte": start, "$lte": end}
+    })
+    return [
+        {"page": p["page"], "text": p.get("text", ""), "offset": p.get("offset", 0)}
+        for p in sorted(pages, key=lambda p: p["page"])
+    ]
+
+def build_page_context(document: dict, limit: int = PAGE_CONTEXT_CHARS) -> Optional[str]:
+    """Document text for the AI prompt with [Page N] markers, or None without stored pages"""
+    if not document.get("pageCount"):
+        return None
+    pages = document_pages_collection.find({
+        "documentId": str(document["_id"]),
+        "userId": document.get("userId"),
+        "offset": {"$lt": limit}
+    })
+    context = "\n".join(
+        f"[Page {p['page']}]\n{p.get('text', '')}" for p in sorted(pages, key=lambda p: p["page"])
+    )
+    return context[:limit] or None
+
+def cited_pages(text: str) -> list:
+    """Page numbers cited in an answer as (p. N)"""
+    return sorted({int(n) for n in CITED_PAGE_PATTERN.findall(text or "")})
+
+SYSTEM_PROMPT = "You are a helpful legal document interpretation assistant. Provide clear, accurate, and concise explanations of legal documents and concepts. Always include appropriate disclaimers. Use markdown-like formatting with headings and bullet points for readability."
+
+LEGAL_DISCLAIMER_PROMPT = """
+
+IMPORTANT DISCLAIMER: I am an AI assistant and not a lawyer. 
+This information is for educational purposes only and does not constitute legal advice. 
+Always consult with a qualified attorney for legal matters.
+"""
+
+AI_FAILURE_PREFIX = "AI analysis failed"
+
+def analyze_document_with_ai(document_text: str, question: str = None, cite_pages: bool = False,
+                             document_tokens: int = None) -> str:
+    """Analyze document with Groq AI (document_tokens: whole-document size when document_text is an excerpt)"""
     if not groq_client:
         # Mock response for testing when AI is not available
         print("⚠️  Using mock AI response (Groq not configured)")
@@ -248,6 +1400,9 @@ User Question: {question}
 
 Please analyze this legal document and provide a comprehensive response to the user's question.
 Structure your response with clear sections and bullet points where appropriate.
+"""
+        if cite_pages:
+            prompt += """The document content is marked with [Page N] headers. When you refer to the document, cite the page number like (p. N).
 """
     else:
         prompt = f"""You are Lexibridge, an AI legal document interpretation assistant.
@@ -271,34 +1426,234 @@ Structure your response in clear sections with bullet points.
 """
     
     # Add legal disclaimer
-    prompt += """
-
-IMPORTANT DISCLAIMER: I am an AI assistant and not a lawyer. 
-This information is for educational purposes only and does not constitute legal advice. 
-Always consult with a qualified attorney for legal matters.
-"""
+    prompt += LEGAL_DISCLAIMER_PROMPT
     
-    try:
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful legal document interpretation assistant. Provide clear, accurate, and concise explanations of legal documents and concepts. Always include appropriate disclaimers. Use markdown-like formatting with headings and bullet points for readability."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model="openai/gpt-oss-120b",
-            temperature=0.3,
-            max_tokens=2000
+    messages = [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+    input_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+    if document_tokens is None:
+        document_tokens = estimate_tokens(document_text)
+    candidates = route_models("question" if question else "analysis", input_tokens, question,
+                              document_tokens=document_tokens)
+
+    last_error = None
+    for index, model in enumerate(candidates):
+        started = time.perf_counter()
+        try:
+            chat_completion = groq_client.chat.completions.create(
+                messages=messages,
+                model=model,
+                temperature=0.3,
+                max_tokens=2000,
+                timeout=LLM_TIMEOUT_SECONDS
+            )
+            record_model_call(model, time.perf_counter() - started, getattr(chat_completion, "usage", None))
+            return chat_completion.choices[0].message.content
+        except Exception as e:
+            last_error = e
+            has_fallback = index + 1 < len(candidates) and is_retryable_llm_error(e)
+            record_model_call(model, time.perf_counter() - started, error=e, fallback=has_fallback)
+            if not has_fallback:
+                break
+            print(f"⚠️  Model {model} failed ({e}), falling back to {candidates[index + 1]}")
+
+    print(f"AI Service Error: {last_error}")
+    return f"{AI_FAILURE_PREFIX}: {str(last_error)}. Please try again later."
+
+# Priority- and fairness-aware scheduler for outbound LLM calls
+PRIORITY_INTERACTIVE = 0   # /ask-ai questions a user is waiting on
+PRIORITY_ANALYSIS = 1      # explicit "Analyze with AI" requests
+PRIORITY_BACKGROUND = 2    # auto-analysis on upload
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_ANALYSIS: "analysis", PRIORITY_BACKGROUND: "background"}
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_PER_USER_CONCURRENCY = int(os.getenv("LLM_PER_USER_CONCURRENCY", "2"))
+LLM_PRIORITY_AGING_SECONDS = float(os.getenv("LLM_PRIORITY_AGING_SECONDS", "30"))
+LATENCY_SAMPLE_SIZE = 1000
+
+def percentile(samples, pct: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def latency_summary(samples) -> dict:
+    """p50/p95/p99 of latency samples (seconds) reported in milliseconds"""
+    return {
+        f"p{p}Ms": round(percentile(samples, p) * 1000, 2) if samples else None
+        for p in (50, 95, 99)
+    }
+
+class LLMScheduler:
+    """
+    Admits LLM calls by strict priority class, then by self-clocked weighted fair
+    queuing across users within a class. Caps global and per-user concurrency.
+    Queued work is promoted one class every LLM_PRIORITY_AGING_SECONDS so
+    background analysis cannot starve forever.
+    """
+
+    def __init__(self, max_concurrency: int, per_user_concurrency: int, aging_seconds: float):
+        self.max_concurrency = max_concurrency
+        self.per_user_concurrency = per_user_concurrency
+        self.aging_seconds = aging_seconds
+        self._queue = []
+        self._running = 0
+        self._running_per_user = {}
+        self._virtual_time = {}   # priority -> virtual time
+        self._last_finish = {}    # (priority, userId) -> last virtual finish tag
+        self._sequence = 0
+        self._stats = {
+            name: {"submitted": 0, "completed": 0, "failed": 0,
+                   "queueTimes": deque(maxlen=LATENCY_SAMPLE_SIZE), "serviceTimes": deque(maxlen=LATENCY_SAMPLE_SIZE)}
+            for name in PRIORITY_NAMES.values()
+        }
+
+    def _effective_priority(self, ticket: dict, now: float) -> int:
+        if self.aging_seconds <= 0:
+            return ticket["priority"]
+        promoted = int((now - ticket["enqueuedAt"]) / self.aging_seconds)
+        return max(PRIORITY_INTERACTIVE, ticket["priority"] - promoted)
+
+    def _dispatch(self):
+        now = time.perf_counter()
+        # A caller cancelled while queued has a cancelled future but may not have removed its ticket yet
+        self._queue[:] = [t for t in self._queue if not t["granted"].done()]
+        while self._running < self.max_concurrency and self._queue:
+            eligible = [
+                t for t in self._queue
+                if self._running_per_user.get(t["userId"], 0) < self.per_user_concurrency
+            ]
+            if not eligible:
+                return
+            ticket = min(eligible, key=lambda t: (self._effective_priority(t, now), t["finishTag"], t["sequence"]))
+            self._queue.remove(ticket)
+            self._virtual_time[ticket["priority"]] = ticket["finishTag"]
+            self._running += 1
+            self._running_per_user[ticket["userId"]] = self._running_per_user.get(ticket["userId"], 0) + 1
+            ticket["granted"].set_result(True)
+
+    def _release(self, ticket: dict):
+        self._running -= 1
+        remaining = self._running_per_user.get(ticket["userId"], 1) - 1
+        if remaining > 0:
+            self._running_per_user[ticket["userId"]] = remaining
+        else:
+            self._running_per_user.pop(ticket["userId"], None)
+            self._forget_if_idle(ticket["userId"])
+
+    def _forget_if_idle(self, user_id: str):
+        """Drop a user's finish tags once nothing of theirs is queued or running"""
+        if user_id in self._running_per_user or any(t["userId"] == user_id for t in self._queue):
+            return
+        for priority in PRIORITY_NAMES:
+            self._last_finish.pop((priority, user_id), None)
+
+    async def submit(self, user_id: str, priority: int, func, *args, weight: float = 1.0, cost: float = 1.0):
+        """Queue a blocking call and run it in a worker thread once scheduled"""
+        user_id = str(user_id)
+        weight = weight if weight and weight > 0 else 1.0
+        start_tag = max(self._virtual_time.get(priority, 0.0), self._last_finish.get((priority, user_id), 0.0))
+        finish_tag = start_tag + cost / weight
+        self._last_finish[(priority, user_id)] = finish_tag
+        self._sequence += 1
+        ticket = {
+            "userId": user_id,
+            "priority": priority,
+            "finishTag": finish_tag,
+            "sequence": self._sequence,
+            "enqueuedAt": time.perf_counter(),
+            "granted": asyncio.get_running_loop().create_future()
+        }
+        stats = self._stats[PRIORITY_NAMES[priority]]
+        stats["submitted"] += 1
+        self._queue.append(ticket)
+        self._dispatch()
+
+        try:
+            await ticket["granted"]
+        except asyncio.CancelledError:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                self._forget_if_idle(user_id)
+            elif ticket["granted"].done() and not ticket["granted"].cancelled():
+                self._release(ticket)
+                self._dispatch()
+            raise
+
+        started = time.perf_counter()
+        stats["queueTimes"].append(started - ticket["enqueuedAt"])
+
+        def finished(call: asyncio.Future):
+            # The slot is held until the worker thread returns, even if the caller stopped waiting
+            if call.cancelled() or call.exception() is not None:
+                stats["failed"] += 1
+            else:
+                stats["completed"] += 1
+            stats["serviceTimes"].append(time.perf_counter() - started)
+            self._release(ticket)
+            self._dispatch()
+
+        call = asyncio.ensure_future(asyncio.to_thread(func, *args))
+        call.add_done_callback(finished)
+        # A cancelled caller cannot stop the thread, so only the wait is cancelled
+        return await asyncio.shield(call)
+
+    def queued_count(self, priority: int, user_id: Optional[str] = None) -> int:
+        """Number of calls waiting in a priority class, optionally for one user"""
+        return sum(
+            1 for t in self._queue
+            if t["priority"] == priority and (user_id is None or t["userId"] == str(user_id))
         )
-        
-        return chat_completion.choices[0].message.content
-    except Exception as e:
-        print(f"AI Service Error: {e}")
-        return f"AI analysis failed: {str(e)}. Please try again later."
+
+    def metrics(self) -> dict:
+        """Queue depth, concurrency and queue/service time percentiles per priority class"""
+        queued = {}
+        for ticket in self._queue:
+            name = PRIORITY_NAMES[ticket["priority"]]
+            queued[name] = queued.get(name, 0) + 1
+        return {
+            "maxConcurrency": self.max_concurrency,
+            "perUserConcurrency": self.per_user_concurrency,
+            "running": self._running,
+            "queued": len(self._queue),
+            "classes": {
+                name: {
+                    "submitted": s["submitted"],
+                    "completed": s["completed"],
+                    "failed": s["failed"],
+                    "queued": queued.get(name, 0),
+                    "queueTime": latency_summary(list(s["queueTimes"])),
+                    "serviceTime": latency_summary(list(s["serviceTimes"]))
+                }
+                for name, s in self._stats.items()
+            }
+        }
+
+llm_scheduler = LLMScheduler(LLM_MAX_CONCURRENCY, LLM_PER_USER_CONCURRENCY, LLM_PRIORITY_AGING_SECONDS)
+
+async def run_ai_analysis(current_user: dict, priority: int, document_text: str, question: str = None,
+                          cite_pages: bool = False, document_tokens: int = None) -> str:
+    """Run analyze_document_with_ai through the LLM scheduler on behalf of a user"""
+    return await llm_scheduler.submit(
+        str(current_user["_id"]),
+        priority,
+        analyze_document_with_ai,
+        document_text,
+        question,
+        cite_pages,
+        document_tokens,
+        weight=current_user.get("schedulerWeight", 1.0)
+    )
 
 async def get_current_user(payload: dict = Depends(verify_token)) -> dict:
     """Get current user from token payload"""
@@ -311,10 +1666,358 @@ async def get_current_user(payload: dict = Depends(verify_token)) -> dict:
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         return user
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         print(f"Get current user error: {e}")
         raise HTTPException(status_code=401, detail=f"Invalid user ID: {str(e)}")
 
+# Persistent WebSocket chat sessions
+CHAT_CHUNK_CHARS = int(os.getenv("CHAT_CHUNK_CHARS", "1200"))
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "1500"))
+CHAT_MEMORY_TOKEN_BUDGET = int(os.getenv("CHAT_MEMORY_TOKEN_BUDGET", "800"))
+CHAT_MEMORY_MAX_TURNS = int(os.getenv("CHAT_MEMORY_MAX_TURNS", "6"))
+CHAT_MEMORY_ANSWER_CHARS = 1500
+
+chat_session_stats = {
+    "activeSessions": 0,
+    "sessions": 0,
+    "messages": 0,
+    "latencies": deque(maxlen=LATENCY_SAMPLE_SIZE),
+    "firstTokenLatencies": deque(maxlen=LATENCY_SAMPLE_SIZE),
+    "setupTimes": deque(maxlen=LATENCY_SAMPLE_SIZE)
+}
+
+def chat_session_metrics() -> dict:
+    return {
+        "activeSessions": chat_session_stats["activeSessions"],
+        "sessions": chat_session_stats["sessions"],
+        "messages": chat_session_stats["messages"],
+        "setupTime": latency_summary(list(chat_session_stats["setupTimes"])),
+        "messageLatency": latency_summary(list(chat_session_stats["latencies"])),
+        "firstTokenLatency": latency_summary(list(chat_session_stats["firstTokenLatencies"]))
+    }
+
+def save_question_response(current_user: dict, document_id: Optional[str], document_name: str,
+                           question: str, answer: str, source: str) -> str:
+    """Store a Q&A exchange in responses and the user's chat history, returning its responseId"""
+    response_id = str(uuid.uuid4())
+    response_doc = {
+        "responseId": response_id,
+        "userId": str(current_user["_id"]),
+        "userName": current_user["username"],
+        "documentId": document_id,
+        "documentName": document_name,
+        "userMessage": question,
+        "aiResponse": answer,
+        "timestamp": datetime.utcnow(),
+        "type": "question",
+        "source": source
+    }
+
+    try:
+        responses_collection.insert_one(response_doc)
+        index_for_search("response", response_doc)
+    except Exception as e:
+        print(f"⚠️  Failed to save response: {e}")
+
+    # Update user history
+    try:
+        users_collection.update_one(
+            {"_id": current_user["_id"]},
+            {
+                "$push": {
+                    "chatHistory": {
+                        "responseId": response_id,
+                        "documentId": document_id,
+                        "documentName": document_name,
+                        "userMessage": question,
+                        "aiResponse": answer[:500] + "..." if len(answer) > 500 else answer,
+                        "timestamp": datetime.utcnow()
+                    }
+                }
+            }
+        )
+    except Exception as e:
+        print(f"⚠️  Failed to update user history: {e}")
+
+    return response_id
+
+def chunk_page_text(text: str, size: int = CHAT_CHUNK_CHARS) -> list:
+    """Split a page into chunks of roughly `size` characters on line boundaries"""
+    chunks, current = [], ""
+    for line in text.split("\n"):
+        while len(line) > size:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:size])
+            line = line[size:]
+        if current and len(current) + len(line) + 1 > size:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+class DocumentChatContext:
+    """Document chunks with token counts and a BM25 retrieval index, built once per session"""
+
+    def __init__(self, pages: list):
+        self.chunks = []
+        self.postings = {}
+        for page in pages:
+            for text in chunk_page_text(page.get("text", "")):
+                tokens = search_tokens(text)
+                index = len(self.chunks)
+                self.chunks.append({"page": page["page"], "text": text, "tokens": estimate_tokens(text), "length": len(tokens)})
+                for token in set(tokens):
+                    self.postings.setdefault(token, []).append((index, tokens.count(token)))
+        self.total_tokens = sum(c["tokens"] for c in self.chunks)
+        self.average_length = (sum(c["length"] for c in self.chunks) / len(self.chunks)) if self.chunks else 1
+
+    def retrieve(self, question: str, token_budget: int) -> list:
+        """Most relevant chunks within the token budget, in document order"""
+        scores = {}
+        total = len(self.chunks)
+        for term in set(search_tokens(question)):
+            postings = self.postings.get(term, [])
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, tf in postings:
+                length = self.chunks[index]["length"]
+                norm = tf + _BM25_K1 * (1 - _BM25_B + _BM25_B * length / (self.average_length or 1))
+                scores[index] = scores.get(index, 0.0) + idf * tf * (_BM25_K1 + 1) / norm
+
+        # Without any matching terms, fall back to the start of the document
+        ranked = sorted(scores, key=lambda i: (-scores[i], i)) if scores else range(total)
+        selected, used = [], 0
+        for index in ranked:
+            tokens = self.chunks[index]["tokens"]
+            if used + tokens > token_budget:
+                continue
+            selected.append(index)
+            used += tokens
+        return [self.chunks[i] for i in sorted(selected)]
+
+class ChatMemory:
+    """Rolling conversation memory bounded by turn count and token budget"""
+
+    def __init__(self, token_budget: int = CHAT_MEMORY_TOKEN_BUDGET, max_turns: int = CHAT_MEMORY_MAX_TURNS):
+        self.token_budget = token_budget
+        self.turns = deque(maxlen=max_turns)
+
+    def add(self, question: str, answer: str):
+        answer = answer if len(answer) <= CHAT_MEMORY_ANSWER_CHARS else answer[:CHAT_MEMORY_ANSWER_CHARS] + "..."
+        self.turns.append((question, answer, estimate_tokens(question) + estimate_tokens(answer)))
+
+    def messages(self) -> tuple:
+        """(chat messages for the most recent turns that fit the budget, tokens used)"""
+        kept, used = [], 0
+        for question, answer, tokens in reversed(self.turns):
+            if used + tokens > self.token_budget:
+                break
+            kept.append((question, answer))
+            used += tokens
+        messages = []
+        for question, answer in reversed(kept):
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "assistant", "content": answer})
+        return messages, used
+
+def build_session_messages(chunks: list, memory_messages: list, question: str) -> list:
+    """Prompt for a chat-session question: retrieved excerpts plus rolling memory"""
+    excerpts = "\n\n".join(f"[Page {c['page']}]\n{c['text']}" for c in chunks)
+    prompt = f"""You are Lexibridge, an AI legal document interpretation assistant.
+
+Relevant Document Excerpts:
+{excerpts}
+
+User Question: {question}
+
+Please answer the user's question using the document excerpts and the conversation so far.
+Structure your response with clear sections and bullet points where appropriate.
+The excerpts are marked with [Page N] headers. When you refer to the document, cite the page number like (p. N).
+""" + LEGAL_DISCLAIMER_PROMPT
+    return [{"role": "system", "content": SYSTEM_PROMPT}] + memory_messages + [{"role": "user", "content": prompt}]
+
+class AIServiceError(Exception):
+    """Every candidate model failed; raised by stream_ai_completion, possibly after some text was streamed"""
+
+def stream_ai_completion(messages: list, question: str, document_tokens: int = None):
+    """
+    Yield answer text as it streams from Groq, falling back to another model before
+    the first token. Raises AIServiceError if no model completes the answer.
+    """
+    if not groq_client:
+        answer = (f"Mock AI Response to: {question}\n\nThis is a mock response since the AI service is not configured. "
+                  "Please set up Groq API key in .env file.")
+        for word in re.findall(r"\S+\s*", answer):
+            yield word
+        return
+
+    input_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+    candidates = route_models("question", input_tokens, question, document_tokens=document_tokens)
+    last_error = None
+    produced = False
+    for index, model in enumerate(candidates):
+        started = time.perf_counter()
+        completion_chars = 0
+        try:
+            stream = groq_client.chat.completions.create(
+                messages=messages,
+                model=model,
+                temperature=0.3,
+                max_tokens=2000,
+                timeout=LLM_TIMEOUT_SECONDS,
+                stream=True
+            )
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    produced = True
+                    completion_chars += len(delta)
+                    yield delta
+            usage = SimpleNamespace(prompt_tokens=input_tokens, completion_tokens=completion_chars // 4)
+            record_model_call(model, time.perf_counter() - started, usage)
+            return
+        except Exception as e:
+            last_error = e
+            has_fallback = not produced and index + 1 < len(candidates) and is_retryable_llm_error(e)
+            record_model_call(model, time.perf_counter() - started, error=e, fallback=has_fallback)
+            if not has_fallback:
+                break
+            print(f"⚠️  Model {model} failed ({e}), falling back to {candidates[index + 1]}")
+
+    print(f"AI Service Error: {last_error}")
+    raise AIServiceError(f"{AI_FAILURE_PREFIX}: {str(last_error)}. Please try again later.")
+
+async def stream_scheduled_answer(current_user: dict, messages: list, question: str, on_delta,
+                                  document_tokens: int = None) -> str:
+    """Stream an answer through the LLM scheduler, calling on_delta for each text piece"""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def produce():
+        parts = []
+        stream = stream_ai_completion(messages, question, document_tokens)
+        try:
+            for delta in stream:
+                if stopped.is_set():
+                    break  # consumer went away; stop reading from Groq
+                parts.append(delta)
+                loop.call_soon_threadsafe(queue.put_nowait, delta)
+        finally:
+            stream.close()
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+        return "".join(parts)
+
+    task = asyncio.create_task(llm_scheduler.submit(
+        str(current_user["_id"]), PRIORITY_INTERACTIVE, produce, weight=current_user.get("schedulerWeight", 1.0)
+    ))
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                break
+            delta = getter.result()
+            if delta is None:
+                break
+            await on_delta(delta)
+        # Deliver anything queued after the worker finished
+        while not queue.empty():
+            delta = queue.get_nowait()
+            if delta is not None:
+                await on_delta(delta)
+    except BaseException:
+        # on_delta failed (e.g. client disconnected) or we were cancelled: stop the producer and reap it
+        stopped.set()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        raise
+    return await task
+
+class ChatSession:
+    """A document chat: context prepared once, answers streamed, memory kept between questions"""
+
+    def __init__(self, current_user: dict, document: dict):
+        self.current_user = current_user
+        self.document = document
+        self.document_id = str(document["_id"])
+        self.document_name = document.get("documentName", "Unknown")
+        if document.get("pageCount"):
+            pages = fetch_document_pages(document, 1, document["pageCount"])
+        else:
+            pages = fetch_document_pages(document, 1, 1)
+        self.context = DocumentChatContext(pages)
+        self.memory = ChatMemory()
+        self.facts = document.get("facts")
+        self.cache_key = document_cache_key(document) if ANSWER_CACHE_ENABLED else None
+
+    async def answer(self, question: str, message_id, send) -> dict:
+        """Answer one question, streaming deltas through `send`; returns the closing message"""
+        started = time.perf_counter()
+        first_token_at = None
+
+        async def on_delta(text: str):
+            nonlocal first_token_at
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            await send({"type": "delta", "id": message_id, "text": text})
+
+        source = "ai"
+        cache_match = None
+        context_tokens = 0
+        memory_messages, memory_tokens = self.memory.messages()
+        # Follow-ups depend on the conversation so far, so they neither use nor fill the shared answer cache
+        use_cache = self.cache_key is not None and not memory_messages
+        answer = answer_from_facts(question, self.facts) if FACTS_FAST_PATH_ENABLED else None
+        if answer:
+            source = "local_facts"
+        elif use_cache:
+            cache_match = answer_cache.lookup(self.cache_key, question)
+            if cache_match:
+                answer = cache_match["answer"]
+                source = "cache"
+
+        if answer:
+            await on_delta(answer)
+        else:
+            chunks = self.context.retrieve(question, CHAT_CONTEXT_TOKEN_BUDGET)
+            context_tokens = sum(c["tokens"] for c in chunks)
+            messages = build_session_messages(chunks, memory_messages, question)
+            answer = await stream_scheduled_answer(
+                self.current_user, messages, question, on_delta, self.context.total_tokens
+            )
+            if use_cache and groq_client:
+                answer_cache.store(self.cache_key, question, answer)
+
+        self.memory.add(question, answer)
+        response_id = save_question_response(
+            self.current_user, self.document_id, self.document_name, question, answer, source
+        )
+
+        latency = time.perf_counter() - started
+        chat_session_stats["messages"] += 1
+        chat_session_stats["latencies"].append(latency)
+        if first_token_at is not None:
+            chat_session_stats["firstTokenLatencies"].append(first_token_at - started)
+        return {
+            "type": "answer_end",
+            "id": message_id,
+            "responseId": response_id,
+            "source": source,
+            "citedPages": cited_pages(answer),
+            "cacheMatch": {"matchedQuestion": cache_match["question"]} if cache_match else None,
+            "contextTokens": context_tokens,
+            "memoryTokens": memory_tokens,
+            "firstTokenMs": round((first_token_at - started) * 1000, 2) if first_token_at else None,
+            "latencyMs": round(latency * 1000, 2)
+        }
+
 # Routes
 @app.get("/")
 async def root():
@@ -325,7 +2028,7 @@ async def root():
         "status": "active",
         "version": "1.0.0",
         "timestamp": datetime.utcnow().isoformat(),
-        "database": "connected" if db is not None else "in-memory",
+        "database": database_state.status,
         "ai_service": "available" if groq_client else "mock"
     }
 
@@ -334,14 +2037,32 @@ async def health_check():
     """Health check for frontend"""
     return {
         "success": True,
-        "status": "healthy",
+        "status": "healthy" if database_state.status != "connecting" or DB_UNAVAILABLE_MODE == "memory" else "starting",
         "timestamp": datetime.utcnow().isoformat(),
         "services": {
-            "database": "connected" if db is not None else "in-memory",
+            "database": database_state.status,
             "ai_service": "available" if groq_client is not None else "mock"
+        },
+        "database": database_state.health(),
+        "startup": {
+            "readyMs": startup_ready_ms,
+            "uptimeSeconds": round(time.perf_counter() - PROCESS_STARTED_AT, 1)
         }
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Runtime metrics for caches and AI usage"""
+    return {
+        "success": True,
+        "timestamp": datetime.utcnow().isoformat(),
+        "answerCache": answer_cache.metrics(),
+        "llmScheduler": llm_scheduler.metrics(),
+        "uploads": upload_admission.metrics() if upload_admission else None,
+        "llmModels": model_metrics(),
+        "chatSessions": chat_session_metrics()
+    }
+
 @app.post("/register")
 async def register(
     request: Request,
@@ -465,28 +2186,38 @@ async def upload_document(
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    # Check file size (max 25MB)
+    # Check file size (the admission middleware already bounded the streamed body)
     file.file.seek(0, 2)  # Seek to end
     file_size = file.file.tell()
     file.file.seek(0)  # Reset to beginning
     
-    if file_size > 25 * 1024 * 1024:  # 25MB
-        raise HTTPException(status_code=400, detail="File size exceeds 25MB limit")
+    if file_size > MAX_UPLOAD_BYTES:
+        raise UploadTooLarge()
     
-    # Extract text
+    # Extract text (bounded number of concurrent extractions, off the event loop)
     try:
-        extracted_text = extract_text_from_pdf(file)
-        print(f"✅ Text extracted successfully: {len(extracted_text)} characters")
+        async with extraction_semaphore:
+            pages = await asyncio.to_thread(extract_pages_from_pdf, file)
+        full_text, page_offsets = join_pages(pages)
+        extracted_text = clean_extracted_text(full_text)
+        print(f"✅ Text extracted successfully: {len(extracted_text)} characters, {len(pages)} pages")
     except Exception as e:
         print(f"❌ Text extraction failed: {e}")
         raise HTTPException(status_code=400, detail=f"Failed to extract text from PDF: {str(e)}")
+
+    # Extract structured facts locally from the full text (no AI call), also off the event loop
+    async with extraction_semaphore:
+        facts = await asyncio.to_thread(extract_document_facts, full_text, page_offsets)
+    print(f"✅ Facts extracted in {facts['stats']['extractionMs']}ms: "
+          f"{len(facts['dates'])} dates, {len(facts['amounts'])} amounts, "
+          f"{len(facts['parties'])} parties, {len(facts['clauses'])} clauses")
     
     # Auto-run AI analysis immediately on upload
     print("🔄 Auto-running AI analysis on upload...")
     ai_summary = ""
     analysis_status = "pending"
     try:
-        ai_summary = analyze_document_with_ai(extracted_text)
+        ai_summary = await run_ai_analysis(current_user, PRIORITY_BACKGROUND, extracted_text)
         analysis_status = "completed"
         print("✅ Auto AI analysis completed")
     except Exception as e:
@@ -498,6 +2229,9 @@ async def upload_document(
         "originalFilename": file.filename,
         "documentContent": extracted_text,
         "aiSummary": ai_summary,
+        "facts": facts,
+        "pageCount": len(pages),
+        "pageOffsets": page_offsets,
         "userId": str(current_user["_id"]),
         "userName": current_user["username"],
         "fileSize": file_size,
@@ -510,6 +2244,23 @@ async def upload_document(
     # Save to database
     result = documents_collection.insert_one(document_doc)
     document_id = str(result.inserted_id) if hasattr(result, 'inserted_id') else str(document_doc["_id"])
+    index_for_search("document", document_doc)
+
+    # Per-page text lives in its own collection so pages can be served lazily
+    if pages:
+        try:
+            document_pages_collection.insert_many([
+                {
+                    "documentId": document_id,
+                    "userId": str(current_user["_id"]),
+                    "page": number,
+                    "text": page_text,
+                    "offset": page_offsets[number - 1]
+                }
+                for number, page_text in enumerate(pages, start=1)
+            ])
+        except Exception as e:
+            print(f"⚠️  Failed to save document pages: {e}")
 
     print(f"✅ Document saved to database: {document_id}")
 
@@ -519,6 +2270,7 @@ async def upload_document(
         "documentId": document_id,
         "documentName": file.filename,
         "extractedTextLength": len(extracted_text),
+        "pageCount": len(pages),
         "fileSize": file_size,
         "analysisStatus": analysis_status,
         "aiSummary": ai_summary
@@ -561,7 +2313,7 @@ async def analyze_document(
     # Analyze with AI
     try:
         print("🔄 Starting AI analysis...")
-        ai_summary = analyze_document_with_ai(document_content)
+        ai_summary = await run_ai_analysis(current_user, PRIORITY_ANALYSIS, document_content)
         print("✅ AI analysis completed")
         
     except Exception as e:
@@ -581,6 +2333,7 @@ async def analyze_document(
                 }
             }
         )
+        index_for_search("document", {**document, "aiSummary": ai_summary})
     except Exception as e:
         print(f"⚠️  Failed to update document: {e}")
     
@@ -600,6 +2353,7 @@ async def analyze_document(
     
     try:
         responses_collection.insert_one(response_doc)
+        index_for_search("response", response_doc)
     except Exception as e:
         print(f"⚠️  Failed to save response: {e}")
     
@@ -647,6 +2401,7 @@ async def ask_ai(
     user_id = str(current_user["_id"])
     document_content = ""
     document_name = "General Question"
+    document = None
     
     # Get document if provided
     if documentId:
@@ -669,54 +2424,55 @@ async def ask_ai(
             print(f"⚠️  Error fetching document: {e}")
             # Continue without document context
     
-    # Analyze with AI
+    # Analyze with AI (simple factual questions are answered from local facts)
     try:
-        ai_response = analyze_document_with_ai(document_content, question)
+        ai_response = None
+        source = "ai"
+        if FACTS_FAST_PATH_ENABLED and document:
+            ai_response = answer_from_facts(question, document.get("facts"))
+            if ai_response:
+                source = "local_facts"
+                print("⚡ Answered from locally extracted facts (no AI call)")
+        # Near-duplicate questions against the same document content reuse the cached answer
+        cache_key = document_cache_key(document) if ANSWER_CACHE_ENABLED and document else None
+        cache_match = None
+        if not ai_response and cache_key:
+            cache_match = answer_cache.lookup(cache_key, question)
+            if cache_match:
+                ai_response = cache_match["answer"]
+                source = "cache"
+                print(f"♻️  Answered from cache: {cache_match['question']}")
+        if not ai_response:
+            # Page-marked context lets the model cite page numbers
+            page_context = None
+            if document:
+                try:
+                    page_context = build_page_context(document)
+                except Exception as e:
+                    print(f"⚠️  Failed to load document pages: {e}")
+            ai_response = await run_ai_analysis(
+                current_user, PRIORITY_INTERACTIVE, page_context or document_content, question, bool(page_context),
+                document_size_tokens(document)
+            )
+            # Only cache real AI answers, not mock or failure messages
+            if ai_response.startswith(AI_FAILURE_PREFIX):
+                source = "error"
+            elif cache_key and groq_client:
+                answer_cache.store(cache_key, question, ai_response)
         
         # Save response
-        response_id = str(uuid.uuid4())
-        response_doc = {
-            "responseId": response_id,
-            "userId": user_id,
-            "userName": current_user["username"],
-            "documentId": documentId,
-            "documentName": document_name,
-            "userMessage": question,
-            "aiResponse": ai_response,
-            "timestamp": datetime.utcnow(),
-            "type": "question"
-        }
-        
-        try:
-            responses_collection.insert_one(response_doc)
-        except Exception as e:
-            print(f"⚠️  Failed to save response: {e}")
-        
-        # Update user history
-        try:
-            users_collection.update_one(
-                {"_id": current_user["_id"]},
-                {
-                    "$push": {
-                        "chatHistory": {
-                            "responseId": response_id,
-                            "documentId": documentId,
-                            "documentName": document_name,
-                            "userMessage": question,
-                            "aiResponse": ai_response[:500] + "..." if len(ai_response) > 500 else ai_response,
-                            "timestamp": datetime.utcnow()
-                        }
-                    }
-                }
-            )
-        except Exception as e:
-            print(f"⚠️  Failed to update user history: {e}")
+        response_id = save_question_response(current_user, documentId, document_name, question, ai_response, source)
         
         return {
             "success": True,
             "responseId": response_id,
             "userMessage": question,
             "aiResponse": ai_response,
+            "source": source,
+            "citedPages": cited_pages(ai_response),
+            "cacheMatch": {
+                "matchedQuestion": cache_match["question"]
+            } if cache_match else None,
             "timestamp": datetime.utcnow().isoformat()
         }
         
@@ -759,32 +2515,45 @@ async def get_user_documents(current_user: dict = Depends(get_current_user)):
 
 @app.get("/documents/{document_id}")
 async def get_document(
+    request: Request,
     document_id: str,
+    include_content: bool = True,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get specific document with content"""
+    """Get specific document with content (pass include_content=false and use /pages to load text lazily)"""
     try:
         # Try to convert to ObjectId if it looks like one
         try:
             doc_id = ObjectId(document_id) if ObjectId.is_valid(document_id) else document_id
         except:
             doc_id = document_id
-            
-        document = documents_collection.find_one({
+
+        query = {
             "_id": doc_id,
             "userId": str(current_user["_id"])
-        })
+        }
+
+        # Revalidate against the version fields before loading the full body
+        version = documents_collection.find_one(query, DOCUMENT_VERSION_FIELDS)
+        if not version:
+            raise HTTPException(status_code=404, detail="Document not found")
+        etag = make_etag("document", version["_id"], document_version(version), include_content)
+        if etag_matches(request, etag):
+            return not_modified_response(request, etag)
+
+        document = documents_collection.find_one(query)
         
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        return {
+        return fast_json_response(request, {
             "success": True,
             "document": {
                 "id": str(document["_id"]),
                 "documentName": document["documentName"],
                 "originalFilename": document.get("originalFilename", ""),
-                "documentContent": document.get("documentContent", ""),
+                "documentContent": document.get("documentContent", "") if include_content else None,
+                "pageCount": document.get("pageCount", 1),
                 "aiSummary": document.get("aiSummary", ""),
                 "createdAt": document.get("createdAt", datetime.utcnow()),
                 "updatedAt": document.get("updatedAt", datetime.utcnow()),
@@ -792,22 +2561,133 @@ async def get_document(
                 "analysisStatus": document.get("analysisStatus", "pending"),
                 "analyzedAt": document.get("analyzedAt")
             }
-        }
+        }, etag)
         
     except Exception as e:
         print(f"❌ Error getting document: {e}")
         raise HTTPException(status_code=400, detail=f"Invalid document ID: {str(e)}")
 
+@app.get("/documents/{document_id}/pages")
+async def get_document_pages(
+    request: Request,
+    document_id: str,
+    start: int = 1,
+    end: Optional[int] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the text of a page range (1-based, inclusive) of a document"""
+    try:
+        # Try to convert to ObjectId if it looks like one
+        try:
+            doc_id = ObjectId(document_id) if ObjectId.is_valid(document_id) else document_id
+        except:
+            doc_id = document_id
+
+        query = {
+            "_id": doc_id,
+            "userId": str(current_user["_id"])
+        }
+        document = documents_collection.find_one(query, DOCUMENT_VERSION_FIELDS)
+
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
+
+        page_count = document.get("pageCount", 1)
+        if end is None:
+            end = start + MAX_PAGES_PER_REQUEST - 1
+        if start < 1 or end < start or start > page_count:
+            raise HTTPException(status_code=400, detail=f"Invalid page range, document has {page_count} pages")
+        end = min(end, page_count, start + MAX_PAGES_PER_REQUEST - 1)
+
+        etag = make_etag("pages", document["_id"], document_version(document), start, end)
+        if etag_matches(request, etag):
+            return not_modified_response(request, etag)
+
+        if not document.get("pageCount"):
+            # Older documents are served from their stored content
+            document = documents_collection.find_one(query)
+        pages = fetch_document_pages(document, start, end)
+
+        return fast_json_response(request, {
+            "success": True,
+            "documentId": str(document["_id"]),
+            "pageCount": page_count,
+            "start": start,
+            "end": end,
+            "pages": pages,
+            "nextStart": end + 1 if end < page_count else None
+        }, etag)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error getting document pages: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid document ID: {str(e)}")
+
+@app.get("/documents/{document_id}/facts")
+async def get_document_facts(
+    document_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get locally extracted facts (dates, amounts, parties, clauses) for a document"""
+    try:
+        # Try to convert to ObjectId if it looks like one
+        try:
+            doc_id = ObjectId(document_id) if ObjectId.is_valid(document_id) else document_id
+        except:
+            doc_id = document_id
+
+        document = documents_collection.find_one({
+            "_id": doc_id,
+            "userId": str(current_user["_id"])
+        })
+
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
+
+        facts = document.get("facts")
+        if facts is None:
+            # Documents uploaded before fact extraction existed: extract from stored content once
+            async with extraction_semaphore:
+                facts = await asyncio.to_thread(extract_document_facts, document.get("documentContent", ""))
+            try:
+                documents_collection.update_one({"_id": document["_id"]}, {"$set": {"facts": facts}})
+            except Exception as e:
+                print(f"⚠️  Failed to store extracted facts: {e}")
+
+        return {
+            "success": True,
+            "documentId": str(document["_id"]),
+            "documentName": document.get("documentName", "Unknown"),
+            "facts": facts
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error getting document facts: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid document ID: {str(e)}")
+
 @app.get("/chat-history")
-async def get_chat_history(current_user: dict = Depends(get_current_user)):
+async def get_chat_history(request: Request, current_user: dict = Depends(get_current_user)):
     """Get user's chat history"""
     try:
+        # Responses are append-only, so their count and newest timestamp identify the history
+        stamps = [
+            r.get("timestamp") for r in responses_collection.find(
+                {"userId": str(current_user["_id"])}, {"timestamp": 1}
+            )
+        ]
+        etag = make_etag("chat-history", current_user["_id"], len(stamps), max((t for t in stamps if t), default=""))
+        if etag_matches(request, etag):
+            return not_modified_response(request, etag)
+
         user_responses = list(responses_collection.find(
             {"userId": str(current_user["_id"])}
         ))
         user_responses = sorted(user_responses, key=lambda x: x.get("timestamp", datetime.min), reverse=True)[:50]
         
-        return {
+        return fast_json_response(request, {
             "success": True,
             "responses": [
                 {
@@ -821,7 +2701,7 @@ async def get_chat_history(current_user: dict = Depends(get_current_user)):
                 }
                 for resp in user_responses
             ]
-        }
+        }, etag)
     except Exception as e:
         print(f"❌ Error getting chat history: {e}")
         return {
@@ -829,6 +2709,58 @@ async def get_chat_history(current_user: dict = Depends(get_current_user)):
             "responses": []
         }
 
+@app.get("/search")
+async def search(
+    q: str,
+    cursor: Optional[str] = None,
+    limit: int = SEARCH_PAGE_SIZE,
+    current_user: dict = Depends(get_current_user)
+):
+    """Search the current user's documents, AI summaries and chat responses"""
+    started = time.perf_counter()
+    query = q.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Search query must not be empty")
+    limit = max(1, min(limit, SEARCH_MAX_PAGE_SIZE))
+    offset = decode_search_cursor(cursor)
+
+    try:
+        page, has_more = search_user_content(str(current_user["_id"]), query, offset, limit)
+    except Exception as e:
+        print(f"❌ Search error: {e}")
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+    results = []
+    for score, kind, item in page:
+        if kind == "document":
+            results.append({
+                "type": "document",
+                "id": str(item["_id"]),
+                "documentId": str(item["_id"]),
+                "documentName": item.get("documentName", "Unknown"),
+                "score": round(score, 4),
+                "snippets": search_snippets(item, SEARCH_FIELDS["document"], query),
+                "timestamp": item.get("createdAt")
+            })
+        else:
+            results.append({
+                "type": "response",
+                "id": item.get("responseId", str(item["_id"])),
+                "documentId": item.get("documentId"),
+                "documentName": item.get("documentName", "Unknown"),
+                "score": round(score, 4),
+                "snippets": search_snippets(item, SEARCH_FIELDS["response"], query),
+                "timestamp": item.get("timestamp")
+            })
+
+    return {
+        "success": True,
+        "query": query,
+        "results": results,
+        "nextCursor": encode_search_cursor(offset + limit) if has_more else None,
+        "tookMs": round((time.perf_counter() - started) * 1000, 2)
+    }
+
 @app.get("/profile")
 async def get_profile(current_user: dict = Depends(get_current_user)):
     """Get user profile"""
@@ -869,12 +2801,112 @@ async def check_auth(current_user: dict = Depends(get_current_user)):
         }
     }
 
+async def receive_chat_message(websocket: WebSocket) -> Optional[dict]:
+    """Next JSON object from the client, or None (after sending an error frame) if the frame is malformed"""
+    try:
+        message = json.loads(await websocket.receive_text())
+    except (ValueError, KeyError):  # KeyError: binary frame
+        message = None
+    if not isinstance(message, dict):
+        await websocket.send_json({"type": "error", "detail": "Messages must be JSON objects"})
+        return None
+    return message
+
+@app.websocket("/ws/chat/{document_id}")
+async def chat_session(websocket: WebSocket, document_id: str):
+    """
+    Document chat over a persistent WebSocket. Authenticate with a first
+    {"type": "auth", "token": ...} message (never in the URL, where access logs keep it),
+    then send {"type": "question", "question": ...}. Answers stream back as "delta"
+    messages followed by "answer_end".
+    """
+    await websocket.accept()
+    setup_started = time.perf_counter()
+    session = None
+    try:
+        message = await receive_chat_message(websocket)
+        token = message.get("token") if message and message.get("type") == "auth" else None
+
+        # Authenticate once for the whole session
+        try:
+            payload = jwt.decode(token or "", JWT_SECRET, algorithms=[JWT_ALGORITHM])
+            current_user = await get_current_user(payload)
+        except (jwt.InvalidTokenError, HTTPException) as e:
+            await websocket.send_json({"type": "error", "detail": getattr(e, "detail", "Invalid token")})
+            await websocket.close(code=4401)
+            return
+
+        # Load the document and prepare its context once
+        try:
+            doc_id = ObjectId(document_id) if ObjectId.is_valid(document_id) else document_id
+        except:
+            doc_id = document_id
+        document = documents_collection.find_one({
+            "_id": doc_id,
+            "userId": str(current_user["_id"])
+        })
+        if not document:
+            await websocket.send_json({"type": "error", "detail": "Document not found"})
+            await websocket.close(code=4404)
+            return
+
+        # Loading every page and building the retrieval index is CPU work; keep it off the event loop
+        session = await asyncio.to_thread(ChatSession, current_user, document)
+        chat_session_stats["sessions"] += 1
+        chat_session_stats["activeSessions"] += 1
+        setup_time = time.perf_counter() - setup_started
+        chat_session_stats["setupTimes"].append(setup_time)
+        print(f"💬 Chat session opened: {session.document_name} by {current_user['username']}")
+
+        await websocket.send_json({
+            "type": "ready",
+            "documentId": session.document_id,
+            "documentName": session.document_name,
+            "chunks": len(session.context.chunks),
+            "documentTokens": session.context.total_tokens,
+            "setupMs": round(setup_time * 1000, 2)
+        })
+
+        while True:
+            message = await receive_chat_message(websocket)
+            if message is None:
+                continue
+            if message.get("type") == "ping":
+                await websocket.send_json({"type": "pong"})
+                continue
+            question = message.get("question")
+            question = question.strip() if isinstance(question, str) else ""
+            if message.get("type") != "question" or not question:
+                await websocket.send_json({"type": "error", "detail": "Expected {\"type\": \"question\", \"question\": ...}"})
+                continue
+
+            message_id = message.get("id") or str(uuid.uuid4())
+            await websocket.send_json({"type": "answer_start", "id": message_id})
+            try:
+                await websocket.send_json(await session.answer(question, message_id, websocket.send_json))
+            except WebSocketDisconnect:
+                raise
+            except AIServiceError as e:
+                # Nothing is cached or saved; any text already streamed for this id is incomplete
+                await websocket.send_json({"type": "error", "id": message_id, "detail": str(e)})
+            except Exception as e:
+                print(f"❌ Chat session error: {e}")
+                await websocket.send_json({"type": "error", "id": message_id, "detail": f"AI service error: {str(e)}"})
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if session is not None:
+            chat_session_stats["activeSessions"] -= 1
+            print(f"💬 Chat session closed: {session.document_name}")
+
 # Test endpoint for file upload without auth
 @app.post("/test-upload")
 async def test_upload(file: UploadFile = File(...)):
     """Test upload endpoint (no auth required)"""
     try:
-        extracted_text = extract_text_from_pdf(file)
+        async with extraction_semaphore:
+            extracted_text = await asyncio.to_thread(extract_text_from_pdf, file)
         return {
             "success": True,
             "filename": file.filename,
@@ -889,11 +2921,17 @@ async def test_upload(file: UploadFile = File(...)):
             "error": str(e)
         }
 
+startup_ready_ms = None
+
 @app.on_event("startup")
 async def startup_event():
-    """Run startup checks"""
-    print("🚀 Lexibridge API started")
-    print(f"📁 Database: {'✅ Connected' if db is not None else '⚠️  In-memory (data will be lost on restart)'}")
+    """Run startup checks and connect to MongoDB in the background"""
+    global startup_ready_ms
+    if MONGO_URL:
+        app.state.db_connect_task = asyncio.create_task(database_state.connect_with_retry())
+    startup_ready_ms = round((time.perf_counter() - PROCESS_STARTED_AT) * 1000, 1)
+    print(f"🚀 Lexibridge API started in {startup_ready_ms}ms")
+    print(f"📁 Database: {'🔄 Connecting in background' if MONGO_URL else '⚠️  In-memory (data will be lost on restart)'}")
     print(f"🤖 AI Service: {'✅ Available' if groq_client is not None else '⚠️  Mock (configure GROQ_API_KEY)'}")
     print(f"🔐 JWT Secret: {'✅ Loaded' if JWT_SECRET else '⚠️  Using default (set JWT_SECRET in .env)'}")
 
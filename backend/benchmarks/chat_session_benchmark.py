@@ -0,0 +1,98 @@
+"""
+Per-message latency of the WebSocket chat session versus REST /ask-ai.
+
+Registers a user, uploads a synthetic multi-page contract and asks the same
+series of follow-up questions over both paths against the local Groq
+stand-in. Reports client-observed p50/p95 latency and, for the WebSocket,
+time to first streamed token.
+
+Usage (from the backend directory):
+    python -m benchmarks.chat_session_benchmark --pages 30 --questions 20 --latency 0.05
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-key-with-enough-length")
+
+import fitz  # PyMuPDF
+from fastapi.testclient import TestClient
+
+import app.main as lexibridge
+from app.main import app, latency_summary
+from benchmarks.facts_benchmark import SAMPLE_PAGE
+from benchmarks.groq_standin import StandInGroq
+
+QUESTIONS = [
+    "What notice period applies to termination?",
+    "And who has to give that notice?",
+    "Does the provider keep information confidential afterwards?",
+    "How are invoices handled if payment is late?",
+    "Can you summarise the obligations of the client in that case?",
+]
+
+def synthetic_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for n in range(1, pages + 1):
+        doc.new_page().insert_text((50, 72), SAMPLE_PAGE.format(n=n, day=(n % 28) + 1), fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare WebSocket chat session and REST /ask-ai latency")
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="stand-in Groq latency in seconds")
+    args = parser.parse_args()
+
+    lexibridge.groq_client = StandInGroq(latency=args.latency)
+    lexibridge.ANSWER_CACHE_ENABLED = False  # measure the full path on both sides
+
+    client = TestClient(app)
+    token = client.post("/register", data={
+        "username": "benchmark", "email": "benchmark@example.com", "password": "benchmark-pass"
+    }).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    document_id = client.post(
+        "/upload-document", files={"file": ("contract.pdf", synthetic_pdf(args.pages), "application/pdf")}, headers=headers
+    ).json()["documentId"]
+    questions = [QUESTIONS[i % len(QUESTIONS)] + f" ({i})" for i in range(args.questions)]
+
+    rest_latencies = []
+    for question in questions:
+        started = time.perf_counter()
+        response = client.post("/ask-ai", data={"question": question, "documentId": document_id}, headers=headers)
+        response.raise_for_status()
+        rest_latencies.append(time.perf_counter() - started)
+
+    ws_latencies, first_tokens = [], []
+    with client.websocket_connect(f"/ws/chat/{document_id}") as websocket:
+        websocket.send_json({"type": "auth", "token": token})
+        ready = websocket.receive_json()
+        for i, question in enumerate(questions):
+            started = time.perf_counter()
+            first = None
+            websocket.send_json({"type": "question", "question": question, "id": str(i)})
+            while True:
+                message = websocket.receive_json()
+                if message["type"] == "delta" and first is None:
+                    first = time.perf_counter() - started
+                if message["type"] in ("answer_end", "error"):
+                    break
+            ws_latencies.append(time.perf_counter() - started)
+            first_tokens.append(first or 0.0)
+        memory_tokens = message.get("memoryTokens")
+
+    print(f"Document: {args.pages} pages, {ready['chunks']} chunks, {ready['documentTokens']} tokens "
+          f"(session setup {ready['setupMs']}ms)")
+    rest, ws, first = latency_summary(rest_latencies), latency_summary(ws_latencies), latency_summary(first_tokens)
+    print(f"REST /ask-ai         p50={rest['p50Ms']}ms p95={rest['p95Ms']}ms")
+    print(f"WebSocket complete   p50={ws['p50Ms']}ms p95={ws['p95Ms']}ms")
+    print(f"WebSocket 1st token  p50={first['p50Ms']}ms p95={first['p95Ms']}ms")
+    print(f"Rolling memory on last question: {memory_tokens} tokens")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Throughput benchmark for the local document fact extractors.
+
+Generates a synthetic contract PDF, then measures pages/sec for
+text extraction (PyMuPDF) and for the rule-based fact extraction stage.
+
+Usage (from the backend directory):
+    python -m benchmarks.facts_benchmark --pages 200 --repeat 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import fitz  # PyMuPDF
+
+from app.main import extract_document_facts
+
+SAMPLE_PAGE = """{n}. Payment Terms
+This Service Agreement is entered into on March {day}, 2024 by and between
+Acme Holdings Inc. (the "Client") and Brightline Legal Services LLC (the "Provider").
+The Client shall pay the Provider $12,500.00 per month, with invoices due within
+30 days. A late fee of USD 250 applies after 15/04/2024. Total fees shall not exceed
+$1.5 million over the term ending 2025-12-31.
+
+{n}.1 Termination
+Either party may terminate this Agreement on the 1st day of June, 2025 by giving
+sixty (60) days written notice. Upon termination, the Client shall pay 5,000 dollars
+for work in progress.
+
+CONFIDENTIALITY
+The Provider shall keep all Client information confidential for 3 years.
+"""
+
+def build_pdf(pages: int) -> str:
+    """Write a synthetic contract PDF with the given number of pages"""
+    doc = fitz.open()
+    for n in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_text((50, 72), SAMPLE_PAGE.format(n=n, day=(n % 28) + 1), fontsize=9)
+    path = os.path.join(tempfile.mkdtemp(), "synthetic_contract.pdf")
+    doc.save(path)
+    doc.close()
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local fact extraction throughput")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    path = build_pdf(args.pages)
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        doc = fitz.open(path)
+        text = "".join(page.get_text() for page in doc)
+        doc.close()
+    extract_seconds = (time.perf_counter() - started) / args.repeat
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        facts = extract_document_facts(text)
+    facts_seconds = (time.perf_counter() - started) / args.repeat
+
+    print(f"Pages:                 {args.pages}")
+    print(f"Characters:            {len(text)}")
+    print(f"Facts found:           {len(facts['dates'])} dates, {len(facts['amounts'])} amounts, "
+          f"{len(facts['parties'])} parties, {len(facts['clauses'])} clauses (capped per type)")
+    print(f"PDF text extraction:   {args.pages / extract_seconds:,.0f} pages/sec ({extract_seconds * 1000:.1f}ms)")
+    print(f"Fact extraction:       {args.pages / facts_seconds:,.0f} pages/sec ({facts_seconds * 1000:.1f}ms)")
+
+    os.unlink(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Local stand-in for the Groq client with configurable latency and errors.
+
+Install it in place of the real client:
+    import app.main
+    app.main.groq_client = StandInGroq(latency=0.5, jitter=0.1)
+"""
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+class StandInError(Exception):
+    """Simulated upstream failure carrying an HTTP status code like Groq's APIStatusError"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+class StandInGroq:
+    """Mimics groq.Groq().chat.completions.create() without network access"""
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.0, error_rate: float = 0.0, seed: int = 0,
+                 model_latency: dict = None, rate_limit_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.model_latency = model_latency or {}
+        self.rate_limit_rate = rate_limit_rate
+        self.calls = 0
+        self.calls_per_model = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages, model, timeout=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.calls_per_model[model] = self.calls_per_model.get(model, 0) + 1
+            base = self.model_latency.get(model, self.latency)
+            delay = max(0.0, base + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.error_rate
+            rate_limited = self._random.random() < self.rate_limit_rate
+        if rate_limited:
+            raise StandInError("stand-in Groq rate limit (simulated)", 429)
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        content = f"## Stand-in answer\n\nModel: {model}\n\nSimulated response after {delay * 1000:.0f}ms (p. 1)."
+        if kwargs.get("stream"):
+            return self._stream(content, delay, fail)
+        time.sleep(delay)
+        if fail:
+            raise StandInError("stand-in Groq error (simulated)", 500)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=len(content) // 4,
+                total_tokens=prompt_tokens + len(content) // 4
+            )
+        )
+
+    def _stream(self, content: str, delay: float, fail: bool):
+        """Yield chunks like a streamed completion: first token after ~30% of the latency"""
+        time.sleep(delay * 0.3)
+        if fail:
+            raise StandInError("stand-in Groq error (simulated)", 500)
+        pieces = content.split(" ")
+        for i, piece in enumerate(pieces):
+            time.sleep(delay * 0.7 / len(pieces))
+            text = piece if i == len(pieces) - 1 else piece + " "
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
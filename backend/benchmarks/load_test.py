@@ -0,0 +1,312 @@
+"""
+End-to-end load test for the API.
+
+Starts the stub Groq server and the app under uvicorn (in-memory store by
+default, or a local MongoDB with --mongo-url), generates a synthetic PDF
+corpus of varying page counts, then drives concurrent virtual users through
+a mixed workload: register, login, upload, analyze, ask, chat history and
+document listing. Reports throughput, p50/p95/p99 latency, errors and shed
+requests per endpoint, plus the server's peak RSS.
+
+Results can be saved as a baseline and later runs compared against it; the
+run exits with status 1 when any endpoint's p95 regresses past --threshold.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test --users 20 --duration 60 --save-baseline
+    python -m benchmarks.load_test --users 20 --duration 60 --threshold 0.25
+    python -m benchmarks.load_test --mongo-url mongodb://localhost:27017/lexibridge_bench
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import fitz  # PyMuPDF
+import httpx
+
+from app.main import latency_summary
+from benchmarks.facts_benchmark import SAMPLE_PAGE
+from benchmarks.stub_groq_server import start_stub_server
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+CORPUS_PAGE_COUNTS = (1, 5, 20, 60)
+
+FILLER_SENTENCES = [
+    "The Provider warrants that the services will be performed in a professional manner.",
+    "Neither party shall be liable for delays caused by events beyond its reasonable control.",
+    "This Agreement shall be governed by the laws of the State of New York.",
+    "Any amendment must be made in writing and signed by both parties.",
+    "The Client may audit the Provider's records on thirty (30) days notice.",
+    "All intellectual property created under this Agreement vests in the Client.",
+]
+
+# List requests take the local facts fast path; the rest go to the model (and the answer cache)
+QUESTIONS = [
+    "List all the dates",
+    "Who are the parties to this agreement?",
+    "What is the termination date?",
+    "What notice period applies to termination?",
+    "Does the provider keep information confidential afterwards?",
+    "How are invoices handled if payment is late?",
+    "Is there a limit on the total fees payable?",
+]
+
+def build_corpus(page_counts=CORPUS_PAGE_COUNTS, seed: int = 7) -> list:
+    """Synthetic contract PDFs of varying length, as (filename, bytes) pairs"""
+    rng = random.Random(seed)
+    corpus = []
+    for pages in page_counts:
+        doc = fitz.open()
+        for n in range(1, pages + 1):
+            text = SAMPLE_PAGE.format(n=n, day=(n % 28) + 1)
+            text += "\n" + "\n".join(rng.choice(FILLER_SENTENCES) for _ in range(8))
+            doc.new_page().insert_text((50, 72), text, fontsize=8)
+        corpus.append((f"contract_{pages}p.pdf", doc.tobytes()))
+        doc.close()
+    return corpus
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def peak_rss_mb(pid: int):
+    """Peak resident set size of a process in MB (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, endpoint: str, seconds: float, status: int):
+        entry = self.samples.setdefault(endpoint, {"latencies": [], "errors": 0, "shed": 0})
+        if status in (429, 503):
+            entry["shed"] += 1
+        elif status >= 400 or status == 0:
+            entry["errors"] += 1
+        else:
+            entry["latencies"].append(seconds)
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint, entry in sorted(self.samples.items()):
+            endpoints[endpoint] = {
+                "requests": len(entry["latencies"]) + entry["errors"] + entry["shed"],
+                "throughputPerSec": round(len(entry["latencies"]) / elapsed, 2),
+                "errors": entry["errors"],
+                "shed": entry["shed"],
+                **latency_summary(entry["latencies"])
+            }
+        return endpoints
+
+async def timed(recorder: Recorder, endpoint: str, request):
+    started = time.perf_counter()
+    try:
+        response = await request
+        status = response.status_code
+    except httpx.HTTPError:
+        response, status = None, 0
+    recorder.add(endpoint, time.perf_counter() - started, status)
+    return response if status and status < 400 else None
+
+async def virtual_user(client: httpx.AsyncClient, recorder: Recorder, corpus: list, deadline: float,
+                       questions_per_document: int, rng: random.Random):
+    email = f"load-{uuid.uuid4().hex[:10]}@example.com"
+    password = "load-test-password"
+    registered = await timed(recorder, "POST /register", client.post("/register", data={
+        "username": email.split("@")[0], "email": email, "password": password
+    }))
+    if registered is None:
+        return
+    logged_in = await timed(recorder, "POST /login", client.post("/login", data={"email": email, "password": password}))
+    token = (logged_in or registered).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    while time.perf_counter() < deadline:
+        filename, data = rng.choice(corpus)
+        uploaded = await timed(recorder, "POST /upload-document", client.post(
+            "/upload-document", files={"file": (filename, data, "application/pdf")}, headers=headers
+        ))
+        if uploaded is None:
+            await asyncio.sleep(0.5)  # shed or failed; back off like a client would
+            continue
+        document_id = uploaded.json()["documentId"]
+
+        await timed(recorder, "POST /analyze-document", client.post(
+            "/analyze-document", data={"documentId": document_id}, headers=headers
+        ))
+        for _ in range(questions_per_document):
+            if time.perf_counter() >= deadline:
+                break
+            await timed(recorder, "POST /ask-ai", client.post(
+                "/ask-ai", data={"question": rng.choice(QUESTIONS), "documentId": document_id}, headers=headers
+            ))
+            await timed(recorder, "GET /chat-history", client.get("/chat-history", headers=headers))
+        await timed(recorder, "GET /documents", client.get("/documents", headers=headers))
+
+async def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 60.0):
+    """Wait until the app answers /health with its database connected (or in-memory)"""
+    started = time.perf_counter()
+    health = {}
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("App server exited during startup")
+            try:
+                health = (await client.get("/health")).json()
+                if health["services"]["database"] in ("connected", "in-memory"):
+                    return health
+            except (httpx.HTTPError, ValueError, KeyError):
+                pass
+            await asyncio.sleep(0.2)
+    last_error = (health.get("database") or {}).get("lastError")
+    raise RuntimeError(f"App server did not become ready in time (database: {last_error or 'not connected'})")
+
+async def run_load(args, corpus: list, base_url: str) -> tuple:
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            virtual_user(client, recorder, corpus, deadline, args.questions, random.Random(rng.random()))
+            for _ in range(args.users)
+        ))
+        elapsed = time.perf_counter() - started
+        metrics = (await client.get("/metrics")).json()
+    return recorder.report(elapsed), elapsed, metrics
+
+def compare_with_baseline(results: dict, baseline: dict, threshold: float, min_samples: int = 20) -> list:
+    """Endpoints whose p95 grew by more than the threshold over the baseline"""
+    regressions = []
+    for endpoint, previous in baseline.get("endpoints", {}).items():
+        current = results["endpoints"].get(endpoint)
+        if not current or not previous.get("p95Ms") or current.get("p95Ms") is None:
+            continue
+        if min(previous["requests"], current["requests"]) < min_samples:
+            continue  # e.g. one register/login per user: too few samples for a stable p95
+        change = current["p95Ms"] / previous["p95Ms"] - 1
+        if change > threshold:
+            regressions.append((endpoint, previous["p95Ms"], current["p95Ms"], change))
+    return regressions
+
+def print_report(results: dict):
+    print(f"\nUsers: {results['config']['users']}   Duration: {results['elapsedSeconds']}s   "
+          f"Store: {results['config']['store']}   Peak RSS: {results['peakRssMb']} MB")
+    print(f"{'endpoint':<24}{'reqs':>7}{'ok/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'shed':>6}")
+    for endpoint, stats in results["endpoints"].items():
+        def fmt(value):
+            return "-" if value is None else f"{value:.0f}"
+        print(f"{endpoint:<24}{stats['requests']:>7}{stats['throughputPerSec']:>9.2f}{fmt(stats['p50Ms']):>9}"
+              f"{fmt(stats['p95Ms']):>9}{fmt(stats['p99Ms']):>9}{stats['errors']:>8}{stats['shed']:>6}")
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test against a stub Groq server")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load after warm-up")
+    parser.add_argument("--questions", type=int, default=4, help="questions asked per uploaded document")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub Groq latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub Groq calls failing with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of stub Groq calls failing with 429")
+    parser.add_argument("--mongo-url", default="", help="local MongoDB URL; the in-memory store is used if omitted")
+    parser.add_argument("--pages", default=",".join(str(n) for n in CORPUS_PAGE_COUNTS),
+                        help="comma separated page counts for the synthetic corpus")
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run's results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed p95 growth over the baseline (0.25 = 25%%)")
+    parser.add_argument("--min-samples", type=int, default=20,
+                        help="skip endpoints with fewer requests than this when comparing")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    corpus = build_corpus(tuple(int(n) for n in args.pages.split(",")), seed=args.seed)
+    stub = start_stub_server(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                             rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "GROQ_API_KEY": "stub-key",
+        "GROQ_BASE_URL": stub.base_url,
+        "JWT_SECRET": os.environ.get("JWT_SECRET") or "load-test-secret-key-with-enough-length",
+        "MONGO_URL": args.mongo_url,
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    try:
+        asyncio.run(wait_until_ready(base_url, process))
+        endpoints, elapsed, metrics = asyncio.run(run_load(args, corpus, base_url))
+        rss = peak_rss_mb(process.pid)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        stub.shutdown()
+
+    results = {
+        "config": {
+            "users": args.users, "duration": args.duration, "questions": args.questions,
+            "latency": args.latency, "errorRate": args.error_rate, "rateLimitRate": args.rate_limit_rate,
+            "pages": args.pages, "store": "mongodb" if args.mongo_url else "in-memory"
+        },
+        "elapsedSeconds": round(elapsed, 1),
+        "peakRssMb": rss,
+        "stubGroqCalls": stub.calls,
+        "endpoints": endpoints,
+        "serverMetrics": {key: metrics.get(key) for key in ("answerCache", "llmScheduler", "uploads")},
+    }
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != results["config"]:
+        print("\n⚠️ Baseline was recorded with a different configuration; comparison may not be meaningful")
+    regressions = compare_with_baseline(results, baseline, args.threshold, args.min_samples)
+    if regressions:
+        print(f"\n❌ p95 regressions over {args.threshold:.0%}:")
+        for endpoint, before, after, change in regressions:
+            print(f"   {endpoint:<24}{before:>8.0f}ms -> {after:.0f}ms (+{change:.0%})")
+        sys.exit(1)
+    print(f"\n✅ No endpoint p95 regressed more than {args.threshold:.0%} against the baseline")
+
+if __name__ == "__main__":
+    main()
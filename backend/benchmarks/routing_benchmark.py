@@ -0,0 +1,54 @@
+"""
+Throughput benchmark for cost/latency-based model routing.
+
+Runs the same mix of short questions and full analyses through
+analyze_document_with_ai against the local Groq stand-in, once with every
+call pinned to the default model and once with routing enabled.
+
+Usage (from the backend directory):
+    python -m benchmarks.routing_benchmark --questions 40 --analyses 10
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import app.main as lexibridge
+from benchmarks.groq_standin import StandInGroq
+
+DOCUMENT = "This Lease Agreement is made between Acme Inc. (the \"Landlord\") and Beta LLC (the \"Tenant\"). " * 20
+MODEL_LATENCY = {"openai/gpt-oss-120b": 0.4, "openai/gpt-oss-20b": 0.15, "llama-3.1-8b-instant": 0.08}
+
+def run(label: str, routing: bool, args):
+    lexibridge.LLM_ROUTING_ENABLED = routing
+    lexibridge.model_stats.clear()
+    lexibridge.groq_client = StandInGroq(model_latency=MODEL_LATENCY, jitter=0.02, rate_limit_rate=args.rate_limit)
+    jobs = [("Who is the tenant?",)] * args.questions + [(None,)] * args.analyses
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda job: lexibridge.analyze_document_with_ai(DOCUMENT, job[0]), jobs))
+    elapsed = time.perf_counter() - started
+
+    failed = sum(1 for r in results if r.startswith("AI analysis failed"))
+    print(f"{label:<9} {len(jobs) / elapsed:6.1f} calls/sec  total={elapsed:.2f}s  failed={failed}")
+    for name, stats in lexibridge.model_metrics()["models"].items():
+        print(f"    {name:<22} calls={stats['calls']:<4} p50={stats['latency']['p50Ms']}ms "
+              f"p95={stats['latency']['p95Ms']}ms rateLimited={stats['rateLimited']} fallbacks={stats['fallbacksFrom']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare pinned-model and routed LLM throughput")
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--analyses", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate-limit", type=float, default=0.05, help="fraction of calls that get a simulated 429")
+    args = parser.parse_args()
+
+    run("Pinned", False, args)
+    run("Routed", True, args)
+
+if __name__ == "__main__":
+    main()
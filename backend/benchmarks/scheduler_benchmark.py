@@ -0,0 +1,80 @@
+"""
+Mixed-load benchmark for the LLM scheduler using the local Groq stand-in.
+
+One user bulk-uploads documents (background analysis) while other users ask
+interactive questions. Interactive latency is compared between the scheduler
+and a plain FIFO semaphore with the same global concurrency.
+
+Usage (from the backend directory):
+    python -m benchmarks.scheduler_benchmark --latency 0.2 --bulk 40 --users 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import app.main as lexibridge
+from app.main import (
+    LLMScheduler, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, analyze_document_with_ai, latency_summary
+)
+from benchmarks.groq_standin import StandInGroq
+
+DOCUMENT = "This Agreement is entered into between Acme Inc. and Beta LLC. " * 50
+
+async def run_workload(submit, bulk: int, users: int, questions: int, spacing: float) -> list:
+    """Run the mixed workload and return interactive latencies in seconds"""
+    latencies = []
+
+    async def bulk_uploader():
+        await asyncio.gather(*(submit("bulk-user", PRIORITY_BACKGROUND, DOCUMENT, None) for _ in range(bulk)))
+
+    async def interactive_user(n):
+        for i in range(questions):
+            await asyncio.sleep(spacing)
+            started = time.perf_counter()
+            await submit(f"user-{n}", PRIORITY_INTERACTIVE, DOCUMENT, f"Question {i}?")
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(bulk_uploader(), *(interactive_user(n) for n in range(users)))
+    return latencies
+
+async def main_async(args):
+    lexibridge.groq_client = StandInGroq(latency=args.latency, jitter=args.latency / 4)
+
+    fifo = asyncio.Semaphore(args.concurrency)
+
+    async def fifo_submit(user_id, priority, text, question):
+        async with fifo:
+            return await asyncio.to_thread(analyze_document_with_ai, text, question)
+
+    scheduler = LLMScheduler(args.concurrency, args.per_user, aging_seconds=30)
+
+    async def scheduled_submit(user_id, priority, text, question):
+        return await scheduler.submit(user_id, priority, analyze_document_with_ai, text, question)
+
+    for name, submit in (("FIFO", fifo_submit), ("Scheduler", scheduled_submit)):
+        started = time.perf_counter()
+        latencies = await run_workload(submit, args.bulk, args.users, args.questions, args.spacing)
+        elapsed = time.perf_counter() - started
+        summary = latency_summary(latencies)
+        print(f"{name:<10} interactive p50={summary['p50Ms']}ms p95={summary['p95Ms']}ms "
+              f"p99={summary['p99Ms']}ms  total={elapsed:.2f}s")
+
+    print("Scheduler metrics:", scheduler.metrics()["classes"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark interactive latency under mixed LLM load")
+    parser.add_argument("--latency", type=float, default=0.2, help="stand-in Groq latency in seconds")
+    parser.add_argument("--bulk", type=int, default=40, help="background analyses from one bulk uploader")
+    parser.add_argument("--users", type=int, default=4, help="interactive users")
+    parser.add_argument("--questions", type=int, default=5, help="questions per interactive user")
+    parser.add_argument("--spacing", type=float, default=0.3, help="seconds between a user's questions")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--per-user", type=int, default=2)
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Payload size and serialisation time for the heavy read endpoints.
+
+Compares FastAPI's default path (jsonable_encoder + json.dumps) with the
+orjson path used by fast_json_response, and reports gzip/brotli sizes for
+a /chat-history page (50 responses) and a /documents/{id} payload.
+
+Usage (from the backend directory):
+    python -m benchmarks.serialization_benchmark --repeat 200
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.encoders import jsonable_encoder
+
+from app.main import BROTLI_QUALITY, GZIP_LEVEL, brotli, dumps_json, orjson
+
+AI_RESPONSE = ("## Termination\n\n- Either party may terminate with 60 days written notice.\n"
+               "- Fees for work in progress remain payable.\n\n") * 40
+
+def chat_history_payload():
+    return {
+        "success": True,
+        "responses": [
+            {
+                "responseId": f"resp-{i}",
+                "documentId": str(i % 7),
+                "documentName": "Master Services Agreement.pdf",
+                "userMessage": "What are the termination terms?",
+                "aiResponse": AI_RESPONSE,
+                "timestamp": datetime.utcnow(),
+                "type": "question"
+            }
+            for i in range(50)
+        ]
+    }
+
+def document_payload():
+    return {
+        "success": True,
+        "document": {
+            "id": "1",
+            "documentName": "Master Services Agreement.pdf",
+            "originalFilename": "Master Services Agreement.pdf",
+            "documentContent": ("This Agreement is entered into by and between Acme Inc. and Beta LLC. " * 150)[:10000],
+            "pageCount": 12,
+            "aiSummary": AI_RESPONSE,
+            "createdAt": datetime.utcnow(),
+            "updatedAt": datetime.utcnow(),
+            "fileSize": 482113,
+            "analysisStatus": "completed",
+            "analyzedAt": datetime.utcnow()
+        }
+    }
+
+def timed(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - started) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialisation and compression")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"orjson: {'available' if orjson else 'missing'}, brotli: {'available' if brotli else 'missing'}")
+    for name, payload in (("/chat-history", chat_history_payload()), ("/documents/{id}", document_payload())):
+        default_body, default_ms = timed(lambda: json.dumps(jsonable_encoder(payload)).encode(), args.repeat)
+        fast_body, fast_ms = timed(lambda: dumps_json(payload), args.repeat)
+        gzip_body, gzip_ms = timed(lambda: gzip.compress(fast_body, compresslevel=GZIP_LEVEL), args.repeat)
+        print(f"\n{name}")
+        print(f"  default encoder: {len(default_body):>8,} bytes  {default_ms:7.3f}ms")
+        print(f"  orjson:          {len(fast_body):>8,} bytes  {fast_ms:7.3f}ms  ({default_ms / fast_ms:.1f}x faster)")
+        print(f"  + gzip:          {len(gzip_body):>8,} bytes  {gzip_ms:7.3f}ms")
+        if brotli is not None:
+            br_body, br_ms = timed(lambda: brotli.compress(fast_body, quality=BROTLI_QUALITY), args.repeat)
+            print(f"  + brotli:        {len(br_body):>8,} bytes  {br_ms:7.3f}ms")
+        print("  304 revalidation:        0 bytes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Local HTTP stand-in for the Groq chat completions API.
+
+Serves POST /openai/v1/chat/completions with configurable latency, jitter,
+error and rate-limit rates, so the real Groq SDK inside the app (pointed at
+it through GROQ_BASE_URL) can be load tested without network calls or quota.
+Requests with "stream": true are answered as server-sent events.
+
+Usage (from the backend directory):
+    python -m benchmarks.stub_groq_server --port 8900 --latency 0.2 --error-rate 0.01
+    GROQ_API_KEY=stub GROQ_BASE_URL=http://127.0.0.1:8900 uvicorn app.main:app
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_ANSWER = (
+    "This is a stub analysis. The agreement sets out payment terms, a termination right "
+    "on sixty days notice and a three year confidentiality obligation (p. 1). "
+    "Consult a qualified lawyer before relying on it."
+)
+
+class StubGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
+
+    def send_json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        config = self.server.config
+        model = payload.get("model", "stub")
+        self.server.record(model)
+
+        latency = config.model_latency.get(model, config.latency)
+        time.sleep(max(0.0, random.gauss(latency, config.jitter)))
+
+        roll = random.random()
+        if roll < config.rate_limit_rate:
+            self.send_json(429, {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit"}},
+                           {"Retry-After": "1"})
+            return
+        if roll < config.rate_limit_rate + config.error_rate:
+            self.send_json(503, {"error": {"message": "Service unavailable (stub)", "type": "server_error"}})
+            return
+
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in payload.get("messages", [])) // 4
+        completion_tokens = len(STUB_ANSWER) // 4
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        if payload.get("stream"):
+            self.stream_answer(completion_id, model, config.token_delay)
+            return
+
+        self.send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": STUB_ANSWER},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+    def stream_answer(self, completion_id: str, model: str, token_delay: float):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = STUB_ANSWER.split(" ")
+        for index, word in enumerate(words):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word + (" " if index < len(words) - 1 else "")},
+                    "finish_reason": "stop" if index == len(words) - 1 else None
+                }]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            if token_delay:
+                time.sleep(token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+class StubGroqServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, StubGroqHandler)
+        self.config = config
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str):
+        with self._lock:
+            self.calls[model] = self.calls.get(model, 0) + 1
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.2, jitter: float = 0.05,
+                      error_rate: float = 0.0, rate_limit_rate: float = 0.0, token_delay: float = 0.0,
+                      model_latency: dict = None, seed: int = None) -> StubGroqServer:
+    """Start the stub server on a background thread; port 0 picks a free port"""
+    if seed is not None:
+        random.seed(seed)
+    config = argparse.Namespace(
+        latency=latency, jitter=jitter, error_rate=error_rate, rate_limit_rate=rate_limit_rate,
+        token_delay=token_delay, model_latency=model_latency or {}
+    )
+    server = StubGroqServer((host, port), config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Groq chat completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.2, help="mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="latency standard deviation in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="delay between streamed tokens in seconds")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = start_stub_server(args.host, args.port, args.latency, args.jitter, args.error_rate,
+                               args.rate_limit_rate, args.token_delay, seed=args.seed)
+    print(f"🧪 Stub Groq server listening on {server.base_url} (latency {args.latency}s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("JWT_SECRET", "test-secret-key-with-enough-length-for-hs256")
+os.environ["MONGO_URL"] = ""  # always run against the in-memory store
+
+import fitz  # PyMuPDF
+from fastapi.testclient import TestClient
+
+import app.main as lexibridge
+from benchmarks.facts_benchmark import SAMPLE_PAGE
+from benchmarks.groq_standin import StandInGroq
+
+def synthetic_pdf(pages: int = 3) -> bytes:
+    doc = fitz.open()
+    for n in range(1, pages + 1):
+        doc.new_page().insert_text((50, 72), SAMPLE_PAGE.format(n=n, day=(n % 28) + 1), fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+@pytest.fixture
+def groq(monkeypatch):
+    """Replace the Groq client with the local stand-in"""
+    standin = StandInGroq(latency=0.0)
+    monkeypatch.setattr(lexibridge, "groq_client", standin)
+    return standin
+
+@pytest.fixture
+def client():
+    return TestClient(lexibridge.app)
+
+@pytest.fixture
+def auth_headers(client):
+    name = f"user-{uuid.uuid4().hex[:8]}"
+    response = client.post("/register", data={
+        "username": name, "email": f"{name}@example.com", "password": "test-password"
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def document_id(client, auth_headers, groq):
+    response = client.post(
+        "/upload-document", files={"file": ("contract.pdf", synthetic_pdf(), "application/pdf")}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    return response.json()["documentId"]
@@ -0,0 +1,50 @@
+import pytest
+
+from app.main import QuestionAnswerCache
+
+DOCUMENT = ("doc-1", "content-hash")
+
+@pytest.fixture
+def cache():
+    return QuestionAnswerCache(max_documents=10, max_per_document=10)
+
+@pytest.mark.parametrize("cached, asked", [
+    ("Can we terminate the contract early?", "Can they terminate the contract early?"),
+    ("Can I terminate the contract early?", "Can you terminate the contract early?"),
+    ("What are my obligations?", "What are their obligations?"),
+    ("Is the tenant liable for water damage to the property in winter",
+     "Is the landlord liable for water damage to the property in winter"),
+    ("Is the tenant liable for water damage?", "Is the tenant liable for fire damage?"),
+    ("Can the landlord increase the rent?", "Can the landlord increase the rent every year?"),
+])
+def test_questions_differing_in_content_tokens_miss(cache, cached, asked):
+    cache.store(DOCUMENT, cached, "cached answer")
+    assert cache.lookup(DOCUMENT, asked) is None
+
+@pytest.mark.parametrize("cached, asked", [
+    ("What is the termination date?", "When does this terminate?"),
+    ("Can we terminate the contract early?", "can we terminate early?"),
+    ("Is the tenant liable for water damage?", "Is the tenant liable for any water damage?"),
+    ("Is the tenant liable for water damage?", "Is the tenant liable for damage from water?"),
+    ("How much is the deposit?", "What is the deposit amount?"),
+])
+def test_rephrased_questions_hit(cache, cached, asked):
+    cache.store(DOCUMENT, cached, "cached answer")
+    hit = cache.lookup(DOCUMENT, asked)
+    assert hit is not None
+    assert hit["answer"] == "cached answer"
+
+def test_cache_is_scoped_per_document_version(cache):
+    cache.store(DOCUMENT, "Can we terminate the contract early?", "cached answer")
+    assert cache.lookup(("doc-1", "other-hash"), "Can we terminate the contract early?") is None
+
+def test_least_recently_used_entries_are_evicted():
+    cache = QuestionAnswerCache(max_documents=10, max_per_document=2)
+    cache.store(DOCUMENT, "Who is the tenant?", "tenant")
+    cache.store(DOCUMENT, "Who is the landlord?", "landlord")
+    assert cache.lookup(DOCUMENT, "Who is the tenant?")["answer"] == "tenant"
+    cache.store(DOCUMENT, "What is the rent?", "rent")
+
+    assert cache.lookup(DOCUMENT, "Who is the landlord?") is None
+    assert cache.lookup(DOCUMENT, "Who is the tenant?")["answer"] == "tenant"
+    assert cache.metrics()["evictions"] == 1
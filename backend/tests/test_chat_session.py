@@ -0,0 +1,146 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+import app.main as lexibridge
+from benchmarks.groq_standin import StandInError, StandInGroq
+
+def receive_until(ws, message_type: str) -> dict:
+    while True:
+        message = ws.receive_json()
+        if message["type"] in (message_type, "error"):
+            return message
+
+@contextmanager
+def open_session(client, auth_headers, document_id):
+    with client.websocket_connect(f"/ws/chat/{document_id}") as ws:
+        ws.send_json({"type": "auth", "token": auth_headers["Authorization"].split()[1]})
+        yield ws
+
+@pytest.mark.parametrize("frame", ["not json", "[1, 2, 3]", "42"])
+def test_malformed_frames_get_an_error_and_keep_the_session(client, auth_headers, document_id, frame):
+    with open_session(client, auth_headers, document_id) as ws:
+        assert ws.receive_json()["type"] == "ready"
+        ws.send_text(frame)
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"type": "question", "question": {"not": "a string"}})
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"type": "ping"})
+        assert ws.receive_json() == {"type": "pong"}
+
+def test_malformed_auth_frame_is_rejected(client, document_id):
+    with client.websocket_connect(f"/ws/chat/{document_id}") as ws:
+        ws.send_text("[]")
+        assert ws.receive_json()["type"] == "error"
+        assert ws.receive_json()["type"] == "error"  # then the invalid token error before close
+
+def test_follow_up_answers_are_not_shared_through_the_cache(client, auth_headers, document_id, groq):
+    follow_up = "And who has to give that notice?"
+    with open_session(client, auth_headers, document_id) as ws:
+        assert ws.receive_json()["type"] == "ready"
+        ws.send_json({"type": "question", "question": "What notice period applies to termination?"})
+        assert receive_until(ws, "answer_end")["source"] == "ai"
+        ws.send_json({"type": "question", "question": follow_up})
+        assert receive_until(ws, "answer_end")["source"] == "ai"
+
+    response = client.post("/ask-ai", data={"question": follow_up, "documentId": document_id}, headers=auth_headers)
+    assert response.json()["source"] == "ai"
+
+def test_follow_up_does_not_read_a_cached_answer(client, auth_headers, document_id, groq):
+    follow_up = "Does the provider keep information confidential afterwards?"
+    response = client.post("/ask-ai", data={"question": follow_up, "documentId": document_id}, headers=auth_headers)
+    assert response.json()["source"] == "ai"
+    with open_session(client, auth_headers, document_id) as ws:
+        assert ws.receive_json()["type"] == "ready"
+        ws.send_json({"type": "question", "question": "What notice period applies to termination?"})
+        receive_until(ws, "answer_end")
+        ws.send_json({"type": "question", "question": follow_up})
+        assert receive_until(ws, "answer_end")["source"] == "ai"
+
+def test_failing_consumer_stops_and_reaps_the_producer(monkeypatch):
+    monkeypatch.setattr(lexibridge, "groq_client", StandInGroq(latency=0.5))
+    scheduler = lexibridge.LLMScheduler(max_concurrency=2, per_user_concurrency=2, aging_seconds=0)
+    monkeypatch.setattr(lexibridge, "llm_scheduler", scheduler)
+
+    async def scenario():
+        async def on_delta(text):
+            raise ConnectionError("client went away")
+
+        started = time.perf_counter()
+        with pytest.raises(ConnectionError):
+            await lexibridge.stream_scheduled_answer(
+                {"_id": "user-1"}, [{"role": "user", "content": "hi"}], "hi", on_delta
+            )
+        # The worker stops reading the stream at the next token instead of running it to completion;
+        # the scheduler holds the slot until then
+        while scheduler.metrics()["running"]:
+            await asyncio.sleep(0.01)
+        assert [t for t in asyncio.all_tasks() if t is not asyncio.current_task()] == []
+        return time.perf_counter() - started
+
+    assert asyncio.run(scenario()) < 0.45
+
+class FailingGroq:
+    """Streams one token, then fails like an upstream 502; non-streamed calls fail outright"""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages, model, timeout=None, **kwargs):
+        if not kwargs.get("stream"):
+            raise StandInError("bad gateway", 502)
+        return self._stream()
+
+    def _stream(self):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="The notice period is "))])
+        raise StandInError("bad gateway", 502)
+
+def test_stream_failing_after_first_token_sends_error_and_is_not_cached(client, auth_headers, document_id, monkeypatch):
+    question = "What notice period applies to termination?"
+    monkeypatch.setattr(lexibridge, "groq_client", FailingGroq())
+    with open_session(client, auth_headers, document_id) as ws:
+        assert ws.receive_json()["type"] == "ready"
+        ws.send_json({"type": "question", "question": question, "id": "q1"})
+        assert ws.receive_json()["type"] == "answer_start"
+        assert ws.receive_json() == {"type": "delta", "id": "q1", "text": "The notice period is "}
+        error = ws.receive_json()
+        assert error["type"] == "error" and error["id"] == "q1"
+        assert error["detail"].startswith("AI analysis failed")
+
+    history = client.get("/chat-history", headers=auth_headers).json()
+    assert all(r["userMessage"] != question for r in history["responses"])
+
+    monkeypatch.setattr(lexibridge, "groq_client", StandInGroq(latency=0.0))
+    response = client.post("/ask-ai", data={"question": question, "documentId": document_id}, headers=auth_headers)
+    assert response.json()["source"] == "ai"
+    assert "AI analysis failed" not in response.json()["aiResponse"]
+
+def test_failed_rest_answer_is_marked_and_not_cached(client, auth_headers, document_id, monkeypatch):
+    question = "How are invoices handled if payment is late?"
+    monkeypatch.setattr(lexibridge, "groq_client", FailingGroq())
+    failed = client.post("/ask-ai", data={"question": question, "documentId": document_id}, headers=auth_headers).json()
+    assert failed["source"] == "error"
+
+    monkeypatch.setattr(lexibridge, "groq_client", StandInGroq(latency=0.0))
+    retried = client.post("/ask-ai", data={"question": question, "documentId": document_id}, headers=auth_headers).json()
+    assert retried["source"] == "ai"
+
+def test_token_in_query_string_is_not_accepted(client, auth_headers, document_id):
+    token = auth_headers["Authorization"].split()[1]
+    with client.websocket_connect(f"/ws/chat/{document_id}?token={token}") as ws:
+        ws.send_json({"type": "question", "question": "Who are the parties?"})
+        assert ws.receive_json()["type"] == "error"
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 4401
+
+def test_unknown_document_closes_with_4404(client, auth_headers):
+    with open_session(client, auth_headers, "missing-document") as ws:
+        assert ws.receive_json()["type"] == "error"
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 4404
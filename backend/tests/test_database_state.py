@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from pymongo import errors
+
+import app.main as lexibridge
+
+class FakeCollection:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def create_index(self, keys, **options):
+        failure = self.client.index_failures.get(self.name)
+        if failure:
+            raise failure
+
+class FakeDatabase:
+    def __init__(self, client):
+        self.client = client
+
+    def __getitem__(self, name):
+        return FakeCollection(self.client, name)
+
+class FakeClient:
+    """Stands in for MongoClient; each instance is one connection attempt"""
+    instances = []
+    ping_error = None
+    index_failures_per_attempt = []
+
+    def __init__(self, url, **kwargs):
+        self.closed = False
+        attempt = len(FakeClient.instances)
+        plan = FakeClient.index_failures_per_attempt
+        self.index_failures = plan[attempt] if attempt < len(plan) else {}
+        self.admin = self
+        FakeClient.instances.append(self)
+
+    def command(self, name):
+        if FakeClient.ping_error:
+            raise FakeClient.ping_error
+
+    def __getitem__(self, name):
+        return FakeDatabase(self)
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def database_state(monkeypatch):
+    FakeClient.instances = []
+    FakeClient.ping_error = None
+    FakeClient.index_failures_per_attempt = []
+    monkeypatch.setattr(lexibridge, "MongoClient", FakeClient)
+    monkeypatch.setattr(lexibridge, "MONGO_URL", "mongodb://db.internal:27017")
+    monkeypatch.setattr(lexibridge, "DB_RETRY_INITIAL_SECONDS", 0.01)
+    monkeypatch.setattr(lexibridge, "db", None)
+    return lexibridge.DatabaseState()
+
+def test_client_is_closed_when_index_creation_loses_the_connection(database_state):
+    FakeClient.index_failures_per_attempt = [{"documents": errors.AutoReconnect("connection reset")}]
+    asyncio.run(database_state.connect_with_retry())
+
+    assert database_state.attempts == 2
+    assert [c.closed for c in FakeClient.instances] == [True, False]
+    assert database_state.health()["status"] == "connected"
+
+def test_index_errors_do_not_block_the_connection(database_state):
+    FakeClient.index_failures_per_attempt = [{"users": errors.DuplicateKeyError("E11000 duplicate key")}]
+    asyncio.run(database_state.connect_with_retry())
+
+    health = database_state.health()
+    assert database_state.attempts == 1
+    assert health["status"] == "connected"
+    assert health["indexErrors"] == {"users.email": "DuplicateKeyError", "users.username": "DuplicateKeyError"}
+    assert lexibridge.db is not None
+
+def test_health_reports_error_class_without_topology_details(database_state):
+    FakeClient.ping_error = errors.ServerSelectionTimeoutError(
+        "db.internal:27017: [Errno 111] Connection refused, Topology Description: <TopologyDescription ...>"
+    )
+
+    async def scenario():
+        task = asyncio.create_task(database_state.connect_with_retry())
+        while database_state.attempts < 2:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert database_state.health()["lastError"] == "ServerSelectionTimeoutError"
+    assert all(c.closed for c in FakeClient.instances)
@@ -0,0 +1,74 @@
+import uuid
+
+import pytest
+
+import app.main as lexibridge
+
+from .conftest import synthetic_pdf
+
+@pytest.fixture
+def five_page_document(client, auth_headers, groq):
+    response = client.post(
+        "/upload-document", files={"file": ("long.pdf", synthetic_pdf(pages=5), "application/pdf")}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    return response.json()["documentId"]
+
+def get_pages(client, auth_headers, document_id, **params):
+    return client.get(f"/documents/{document_id}/pages", params=params, headers=auth_headers)
+
+def test_pages_are_returned_in_order_with_offsets(client, auth_headers, five_page_document):
+    body = get_pages(client, auth_headers, five_page_document, start=2, end=4).json()
+    assert body["pageCount"] == 5
+    assert (body["start"], body["end"]) == (2, 4)
+    assert [p["page"] for p in body["pages"]] == [2, 3, 4]
+    assert body["pages"][0]["text"].startswith("2. Payment Terms")
+    offsets = [p["offset"] for p in body["pages"]]
+    assert offsets == sorted(offsets) and offsets[0] > 0
+    assert body["nextStart"] == 5
+
+def test_next_start_walks_the_whole_document(client, auth_headers, five_page_document, monkeypatch):
+    monkeypatch.setattr(lexibridge, "MAX_PAGES_PER_REQUEST", 2)
+    seen, start = [], 1
+    while start is not None:
+        body = get_pages(client, auth_headers, five_page_document, start=start).json()
+        assert len(body["pages"]) <= 2
+        seen += [p["page"] for p in body["pages"]]
+        start = body["nextStart"]
+    assert seen == [1, 2, 3, 4, 5]
+
+def test_end_is_clamped_to_page_count_and_request_limit(client, auth_headers, five_page_document, monkeypatch):
+    body = get_pages(client, auth_headers, five_page_document, start=4, end=99).json()
+    assert (body["end"], body["nextStart"]) == (5, None)
+
+    monkeypatch.setattr(lexibridge, "MAX_PAGES_PER_REQUEST", 2)
+    body = get_pages(client, auth_headers, five_page_document, start=1, end=5).json()
+    assert (body["end"], body["nextStart"]) == (2, 3)
+
+@pytest.mark.parametrize("params", [{"start": 0}, {"start": 6}, {"start": 3, "end": 2}])
+def test_invalid_ranges_are_rejected(client, auth_headers, five_page_document, params):
+    response = get_pages(client, auth_headers, five_page_document, **params)
+    assert response.status_code == 400
+    assert "5 pages" in response.json()["detail"]
+
+def test_pages_of_another_users_document_are_hidden(client, five_page_document):
+    name = f"user-{uuid.uuid4().hex[:8]}"
+    token = client.post("/register", data={
+        "username": name, "email": f"{name}@example.com", "password": "test-password"
+    }).json()["access_token"]
+    response = get_pages(client, {"Authorization": f"Bearer {token}"}, five_page_document)
+    assert response.status_code in (400, 404)
+
+def test_older_documents_are_served_as_one_page(client, auth_headers, document_id):
+    uploaded = lexibridge.documents_collection.find_one({"_id": document_id})
+    legacy_id = lexibridge.documents_collection.insert_one({
+        "userId": uploaded["userId"],
+        "documentName": "legacy.pdf",
+        "documentContent": uploaded["documentContent"]
+    }).inserted_id
+
+    body = get_pages(client, auth_headers, legacy_id).json()
+    assert body["pageCount"] == 1
+    assert body["pages"] == [{"page": 1, "text": uploaded["documentContent"], "offset": 0}]
+    assert body["nextStart"] is None
+    assert get_pages(client, auth_headers, legacy_id, start=2).status_code == 400
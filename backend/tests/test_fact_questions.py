@@ -0,0 +1,63 @@
+import pytest
+
+import app.main as lexibridge
+from app.main import classify_fact_question
+
+@pytest.mark.parametrize("question, fact_type", [
+    ("List all the dates", "dates"),
+    ("Show me the key dates in this contract.", "dates"),
+    ("What are the deadlines?", "dates"),
+    ("List the amounts", "amounts"),
+    ("What are all the fees mentioned in the agreement?", "amounts"),
+    ("Who are the parties?", "parties"),
+    ("Who are the parties to this agreement?", "parties"),
+    ("Show the parties involved", "parties"),
+    ("List clauses", "clauses"),
+    ("Please list all of the sections in the document", "clauses"),
+])
+def test_explicit_list_requests_use_local_facts(question, fact_type):
+    assert classify_fact_question(question) == fact_type
+
+@pytest.mark.parametrize("question", [
+    "What happens if a party breaches?",
+    "How much notice do I need to give?",
+    "What is the late fee if I pay after the due date?",
+    "What clauses are unfair to me?",
+    "What is the termination date?",
+    "When is the contract signed?",
+    "Which party pays the legal fees?",
+    "List the clauses that favour the landlord",
+    "Who are the parties responsible for repairs?",
+    "Show me the dates I could be penalised on",
+])
+def test_qualified_questions_go_to_the_model(question):
+    assert classify_fact_question(question) is None
+
+def test_ask_ai_sends_qualified_party_question_to_model(client, auth_headers, document_id, groq):
+    response = client.post("/ask-ai", data={
+        "question": "What happens if a party breaches?", "documentId": document_id
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["source"] == "ai"
+    assert groq.calls >= 1
+
+def test_ask_ai_answers_list_request_locally(client, auth_headers, document_id, groq):
+    calls_before = groq.calls
+    response = client.post("/ask-ai", data={"question": "Who are the parties?", "documentId": document_id},
+                           headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["source"] == "local_facts"
+    assert groq.calls == calls_before
+
+def test_facts_are_extracted_lazily_for_older_documents(client, auth_headers, document_id):
+    uploaded = lexibridge.documents_collection.find_one({"_id": document_id})
+    legacy_id = lexibridge.documents_collection.insert_one({
+        "userId": uploaded["userId"],
+        "documentName": "legacy.pdf",
+        "documentContent": uploaded["documentContent"]
+    }).inserted_id
+
+    response = client.get(f"/documents/{legacy_id}/facts", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["facts"]["parties"]
+    assert lexibridge.documents_collection.find_one({"_id": legacy_id}).get("facts")
@@ -0,0 +1,73 @@
+import pytest
+
+import app.main as lexibridge
+
+def get_document(client, auth_headers, document_id, encoding, **params):
+    headers = {**auth_headers, "Accept-Encoding": encoding}
+    return client.get(f"/documents/{document_id}", params=params, headers=headers)
+
+def test_each_content_coding_gets_its_own_etag(client, auth_headers, document_id):
+    identity = get_document(client, auth_headers, document_id, "identity")
+    gzipped = get_document(client, auth_headers, document_id, "gzip")
+
+    assert "Content-Encoding" not in identity.headers
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzipped.headers["ETag"] == identity.headers["ETag"][:-1] + '-gzip"'
+    assert gzipped.json() == identity.json()
+    assert "Accept-Encoding" in identity.headers["Vary"]
+
+@pytest.mark.skipif(lexibridge.brotli is None, reason="brotli not installed")
+def test_brotli_is_preferred_when_accepted(client, auth_headers, document_id):
+    response = get_document(client, auth_headers, document_id, "gzip, br")
+    identity = get_document(client, auth_headers, document_id, "identity")
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.headers["ETag"] == identity.headers["ETag"][:-1] + '-br"'
+    assert response.json() == identity.json()
+
+def test_q_zero_coding_is_not_used(client, auth_headers, document_id):
+    response = get_document(client, auth_headers, document_id, "br;q=0, gzip;q=0")
+    assert "Content-Encoding" not in response.headers
+
+def test_small_payloads_are_not_compressed(client, auth_headers, document_id):
+    response = client.get(f"/documents/{document_id}/pages", params={"start": 1, "end": 1},
+                          headers={**auth_headers, "Accept-Encoding": "gzip"})
+    assert len(response.content) < lexibridge.COMPRESSION_MIN_BYTES
+    assert "Content-Encoding" not in response.headers
+
+@pytest.mark.parametrize("encoding", ["identity", "gzip"])
+def test_matching_etag_returns_304_with_the_clients_validator(client, auth_headers, document_id, encoding):
+    first = get_document(client, auth_headers, document_id, encoding)
+    etag = first.headers["ETag"]
+
+    revalidated = client.get(f"/documents/{document_id}",
+                             headers={**auth_headers, "Accept-Encoding": encoding, "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == etag
+
+def test_stale_etag_returns_full_body(client, auth_headers, document_id):
+    response = client.get(f"/documents/{document_id}", headers={**auth_headers, "If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert response.json()["document"]["id"] == document_id
+
+def test_include_content_false_omits_text_and_has_its_own_etag(client, auth_headers, document_id):
+    full = get_document(client, auth_headers, document_id, "identity")
+    light = get_document(client, auth_headers, document_id, "identity", include_content="false")
+
+    assert full.json()["document"]["documentContent"]
+    assert light.json()["document"]["documentContent"] is None
+    assert light.json()["document"]["pageCount"] == full.json()["document"]["pageCount"]
+    assert light.headers["ETag"] != full.headers["ETag"]
+
+    stale = client.get(f"/documents/{document_id}", params={"include_content": "false"},
+                       headers={**auth_headers, "If-None-Match": full.headers["ETag"]})
+    assert stale.status_code == 200
+
+def test_chat_history_etag_changes_after_a_new_answer(client, auth_headers, document_id, groq):
+    first = client.get("/chat-history", headers=auth_headers)
+    assert client.get("/chat-history", headers={**auth_headers, "If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    client.post("/ask-ai", data={"question": "List all the dates", "documentId": document_id}, headers=auth_headers)
+    after = client.get("/chat-history", headers={**auth_headers, "If-None-Match": first.headers["ETag"]})
+    assert after.status_code == 200
+    assert len(after.json()["responses"]) == len(first.json()["responses"]) + 1
@@ -0,0 +1,223 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.main import PRIORITY_ANALYSIS, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, LLMScheduler
+from benchmarks.groq_standin import StandInGroq
+
+class Recorder:
+    """Blocking jobs that record start order and peak concurrency"""
+
+    def __init__(self):
+        self.order = []
+        self.running = {}
+        self.peak = {}
+        self.gate = threading.Event()
+        self._lock = threading.Lock()
+
+    def job(self, user_id: str, label: str, wait_for_gate: bool = False):
+        with self._lock:
+            self.order.append(label)
+            self.running[user_id] = self.running.get(user_id, 0) + 1
+            self.peak[user_id] = max(self.peak.get(user_id, 0), self.running[user_id])
+        if wait_for_gate:
+            self.gate.wait(5)
+        else:
+            time.sleep(0.01)
+        with self._lock:
+            self.running[user_id] -= 1
+        return label
+
+async def until(condition, timeout: float = 2.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.005)
+
+def test_higher_priority_classes_run_first():
+    recorder = Recorder()
+
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, per_user_concurrency=1, aging_seconds=0)
+        blocker = asyncio.create_task(scheduler.submit("u0", PRIORITY_BACKGROUND, recorder.job, "u0", "blocker", True))
+        await until(lambda: recorder.order == ["blocker"])
+        jobs = [
+            asyncio.create_task(scheduler.submit(f"u{i}", priority, recorder.job, f"u{i}", label))
+            for i, (priority, label) in enumerate([
+                (PRIORITY_BACKGROUND, "background"), (PRIORITY_ANALYSIS, "analysis"), (PRIORITY_INTERACTIVE, "interactive")
+            ], start=1)
+        ]
+        await until(lambda: scheduler.metrics()["queued"] == 3)
+        recorder.gate.set()
+        await asyncio.gather(blocker, *jobs)
+
+    asyncio.run(scenario())
+    assert recorder.order == ["blocker", "interactive", "analysis", "background"]
+
+def test_per_user_cap_is_enforced():
+    recorder = Recorder()
+
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=4, per_user_concurrency=1, aging_seconds=0)
+        jobs = [scheduler.submit("a", PRIORITY_INTERACTIVE, recorder.job, "a", f"a{i}") for i in range(4)]
+        jobs.append(scheduler.submit("b", PRIORITY_INTERACTIVE, recorder.job, "b", "b0"))
+        await asyncio.gather(*jobs)
+
+    asyncio.run(scenario())
+    assert recorder.peak == {"a": 1, "b": 1}
+    assert recorder.order.index("b0") < recorder.order.index("a1")
+
+def test_users_share_capacity_fairly():
+    recorder = Recorder()
+
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, per_user_concurrency=1, aging_seconds=0)
+        heavy = [asyncio.create_task(scheduler.submit("heavy", PRIORITY_INTERACTIVE, recorder.job, "heavy", f"h{i}"))
+                 for i in range(6)]
+        light = [asyncio.create_task(scheduler.submit("light", PRIORITY_INTERACTIVE, recorder.job, "light", f"l{i}"))
+                 for i in range(2)]
+        await asyncio.gather(*heavy, *light)
+
+    asyncio.run(scenario())
+    # The light user's calls interleave with the heavy backlog instead of waiting behind all of it
+    assert max(recorder.order.index("l0"), recorder.order.index("l1")) < 5
+
+def test_weight_gives_a_larger_share():
+    recorder = Recorder()
+
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, per_user_concurrency=1, aging_seconds=0)
+        jobs = [scheduler.submit("paid", PRIORITY_INTERACTIVE, recorder.job, "paid", f"p{i}", weight=2.0) for i in range(4)]
+        jobs += [scheduler.submit("free", PRIORITY_INTERACTIVE, recorder.job, "free", f"f{i}") for i in range(4)]
+        await asyncio.gather(*jobs)
+
+    asyncio.run(scenario())
+    first_half = recorder.order[:4]
+    assert sum(label.startswith("p") for label in first_half) >= 3
+
+def test_cancelled_running_call_keeps_its_slot_until_the_thread_finishes():
+    recorder = Recorder()
+
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, per_user_concurrency=1, aging_seconds=0)
+        first = asyncio.create_task(scheduler.submit("a", PRIORITY_INTERACTIVE, recorder.job, "a", "first", True))
+        await until(lambda: recorder.order == ["first"])
+        second = asyncio.create_task(scheduler.submit("b", PRIORITY_INTERACTIVE, recorder.job, "b", "second"))
+        await asyncio.sleep(0.01)
+
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        await asyncio.sleep(0.05)
+        # The worker thread is still calling out, so the global cap still holds
+        assert scheduler.metrics()["running"] == 1
+        assert recorder.order == ["first"]
+
+        recorder.gate.set()
+        assert await second == "second"
+        await until(lambda: scheduler.metrics()["running"] == 0)
+        return scheduler.metrics()["classes"]["interactive"]
+
+    stats = asyncio.run(scenario())
+    assert stats["completed"] == 2
+
+def test_cancelled_queued_call_never_runs():
+    recorder = Recorder()
+
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, per_user_concurrency=1, aging_seconds=0)
+        first = asyncio.create_task(scheduler.submit("a", PRIORITY_INTERACTIVE, recorder.job, "a", "first", True))
+        await until(lambda: recorder.order == ["first"])
+        queued = asyncio.create_task(scheduler.submit("b", PRIORITY_INTERACTIVE, recorder.job, "b", "queued"))
+        await until(lambda: scheduler.metrics()["queued"] == 1)
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        assert scheduler.metrics()["queued"] == 0
+        recorder.gate.set()
+        await first
+
+    asyncio.run(scenario())
+    assert recorder.order == ["first"]
+
+def test_stand_in_groq_calls_respect_global_cap():
+    groq = StandInGroq(latency=0.02)
+    active = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def call(user_id):
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        try:
+            return groq.chat.completions.create(messages=[{"role": "user", "content": "hi"}], model="m")
+        finally:
+            with lock:
+                active["now"] -= 1
+
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=3, per_user_concurrency=2, aging_seconds=0)
+        tasks = [asyncio.create_task(scheduler.submit(f"u{i % 4}", PRIORITY_INTERACTIVE, call, f"u{i % 4}"))
+                 for i in range(16)]
+        await asyncio.sleep(0.01)
+        for task in tasks[::3]:
+            task.cancel()  # disconnecting clients must not let extra calls through
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await until(lambda: scheduler.metrics()["running"] == 0)
+
+    asyncio.run(scenario())
+    assert active["peak"] <= 3
+
+def test_caller_cancelled_while_a_slot_frees_does_not_leak_the_slot():
+    recorder = Recorder()
+
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, per_user_concurrency=1, aging_seconds=0)
+        first = asyncio.create_task(scheduler.submit("a", PRIORITY_INTERACTIVE, recorder.job, "a", "first", True))
+        await until(lambda: recorder.order == ["first"])
+        queued = asyncio.create_task(scheduler.submit("b", PRIORITY_INTERACTIVE, recorder.job, "b", "queued"))
+        await until(lambda: scheduler.metrics()["queued"] == 1)
+
+        # The queued client disconnects in the same loop iteration that frees the slot, i.e. after its
+        # granted future is cancelled but before its task has removed the ticket from the queue
+        release = scheduler._release
+
+        def release_after_disconnect(ticket):
+            queued.cancel()
+            release(ticket)
+
+        scheduler._release = release_after_disconnect
+        recorder.gate.set()
+        await first
+        await asyncio.gather(queued, return_exceptions=True)
+        scheduler._release = release
+
+        assert scheduler.metrics()["running"] == 0
+        assert await asyncio.wait_for(
+            scheduler.submit("c", PRIORITY_INTERACTIVE, recorder.job, "c", "later"), timeout=2
+        ) == "later"
+
+    asyncio.run(scenario())
+    assert recorder.order == ["first", "later"]
+
+def test_finish_tags_are_pruned_for_idle_users():
+    recorder = Recorder()
+
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, per_user_concurrency=1, aging_seconds=0)
+        await asyncio.gather(*(
+            scheduler.submit(f"user-{i}", PRIORITY_INTERACTIVE, recorder.job, f"user-{i}", str(i)) for i in range(20)
+        ))
+        blocked = asyncio.create_task(scheduler.submit("a", PRIORITY_INTERACTIVE, recorder.job, "a", "blocked", True))
+        await until(lambda: "blocked" in recorder.order)
+        queued = asyncio.create_task(scheduler.submit("b", PRIORITY_BACKGROUND, recorder.job, "b", "cancelled"))
+        await until(lambda: scheduler.metrics()["queued"] == 1)
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        assert set(scheduler._last_finish) == {(PRIORITY_INTERACTIVE, "a")}
+        recorder.gate.set()
+        await blocked
+        return scheduler
+
+    assert asyncio.run(scenario())._last_finish == {}
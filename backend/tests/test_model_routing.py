@@ -0,0 +1,72 @@
+import pytest
+
+import app.main as lexibridge
+from app.main import document_size_tokens, estimate_tokens, is_simple_question, route_models
+from benchmarks.stub_groq_server import start_stub_server
+
+LARGE_MODEL = "openai/gpt-oss-120b"
+SMALL_TIER = {m["name"] for m in lexibridge.LLM_MODELS if m["tier"] == "small"}
+SHORT_DOCUMENT = "This Lease is made between Acme Inc. (the Landlord) and Beta LLC (the Tenant). " * 10
+LONG_DOCUMENT = "The Tenant shall maintain the premises and indemnify the Landlord against all claims. " * 120
+
+@pytest.fixture(autouse=True)
+def routing_enabled(monkeypatch):
+    monkeypatch.setattr(lexibridge, "LLM_ROUTING_ENABLED", True)
+    monkeypatch.setattr(lexibridge, "LLM_ROUTING_TARGET", "balanced")
+    lexibridge.model_stats.clear()
+
+@pytest.mark.parametrize("question", [
+    "Who is the tenant?",
+    "What is the monthly rent?",
+    "When does the lease start?",
+    "How many days notice is required?",
+])
+def test_short_lookup_questions_are_simple(question):
+    assert is_simple_question(question)
+
+@pytest.mark.parametrize("question", [
+    "Can the landlord keep my deposit if I leave early?",
+    "What happens if the tenant breaches the repair obligations?",
+    "Explain the indemnity clause",
+    "Who is liable for water damage?",
+    "Is this termination clause fair to me?",
+    "What are my rights under the lease, and can the landlord enter without notice?",
+])
+def test_legal_reasoning_questions_are_not_simple(question):
+    assert not is_simple_question(question)
+
+def test_simple_question_over_short_document_uses_small_tier():
+    tokens = estimate_tokens(SHORT_DOCUMENT)
+    assert route_models("question", tokens, "Who is the tenant?", document_tokens=tokens)[0] in SMALL_TIER
+
+def test_simple_question_over_long_document_uses_large_tier():
+    # The prompt is capped at 3000 characters, so only the whole-document size can tell these apart
+    assert route_models("question", 1000, "Who is the tenant?", document_tokens=estimate_tokens(LONG_DOCUMENT))[0] == LARGE_MODEL
+
+def test_unknown_document_size_uses_large_tier():
+    assert route_models("question", 200, "Who is the tenant?")[0] == LARGE_MODEL
+
+def test_multi_clause_question_uses_large_model(groq):
+    question = ("If the tenant gives notice after the first year but the landlord has already started repairs, "
+                "who pays for the remaining work and the deposit?")
+    assert len(question.split()) <= 25
+    lexibridge.analyze_document_with_ai(LONG_DOCUMENT, question)
+    assert list(groq.calls_per_model) == [LARGE_MODEL]
+
+def test_document_size_uses_page_offsets_beyond_truncated_content():
+    document = {"documentContent": "x" * 10000, "pageCount": 20, "pageOffsets": [i * 3000 for i in range(20)]}
+    assert document_size_tokens(document) == 57000 // 4
+
+def test_rate_limited_model_falls_back_without_sdk_retries(monkeypatch):
+    stub = start_stub_server(latency=0.0, jitter=0.0, rate_limit_rate=1.0)
+    try:
+        monkeypatch.setattr(lexibridge, "GROQ_API_KEY", "stub-key")
+        monkeypatch.setattr(lexibridge, "GROQ_BASE_URL", stub.base_url)
+        monkeypatch.setattr(lexibridge, "groq_client", lexibridge.create_groq_client())
+        answer = lexibridge.analyze_document_with_ai(LONG_DOCUMENT, "Explain the indemnity clause")
+    finally:
+        stub.shutdown()
+
+    assert answer.startswith(lexibridge.AI_FAILURE_PREFIX)
+    # One attempt per candidate model: the router, not the SDK, handles retries
+    assert stub.calls == {name: 1 for name in route_models("question", 1000, "x", document_tokens=10**6)}
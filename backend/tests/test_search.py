@@ -0,0 +1,126 @@
+import uuid
+
+import pytest
+
+import app.main as lexibridge
+
+def user_id(client, headers) -> str:
+    return client.get("/profile", headers=headers).json()["profile"]["id"]
+
+def add_document(owner: str, name: str, content: str) -> str:
+    document = {"userId": owner, "documentName": name, "documentContent": content, "aiSummary": ""}
+    document_id = lexibridge.documents_collection.insert_one(document).inserted_id
+    lexibridge.index_for_search("document", document)
+    return str(document_id)
+
+def search(client, headers, q, **params):
+    response = client.get("/search", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def test_results_are_ranked_by_relevance(client, auth_headers):
+    owner = user_id(client, auth_headers)
+    once = add_document(owner, "lease.pdf", "The parties agree to arbitration in London. " + "Rent is due monthly. " * 20)
+    often = add_document(owner, "dispute.pdf", "Arbitration rules: any arbitration is final; the arbitrator decides.")
+    add_document(owner, "nda.pdf", "Confidential information must not be disclosed.")
+
+    results = search(client, auth_headers, "arbitration")["results"]
+    assert [r["id"] for r in results] == [often, once]
+    assert results[0]["score"] > results[1]["score"]
+
+def test_all_terms_are_required_and_stemmed(client, auth_headers):
+    owner = user_id(client, auth_headers)
+    both = add_document(owner, "both.pdf", "Either party may terminate on notice; termination fees apply.")
+    add_document(owner, "one.pdf", "Termination requires the landlord's consent.")
+
+    results = search(client, auth_headers, "terminate fees")["results"]
+    assert [r["id"] for r in results] == [both]
+
+def test_snippets_highlight_matches_and_escape_html(client, auth_headers):
+    owner = user_id(client, auth_headers)
+    add_document(owner, "markup.pdf", "Clause <b>7</b>: the Indemnity survives; each indemnity is capped.")
+
+    snippet = search(client, auth_headers, "indemnity")["results"][0]["snippets"][0]
+    assert snippet["field"] == "documentContent"
+    assert snippet["text"].count("<mark>") == 2 and "<mark>Indemnity</mark>" in snippet["text"]
+    assert "&lt;b&gt;7&lt;/b&gt;" in snippet["text"] and "<b>" not in snippet["text"]
+
+def test_cursor_pages_through_every_result_once(client, auth_headers):
+    owner = user_id(client, auth_headers)
+    expected = {add_document(owner, f"doc-{n}.pdf", f"Escrow schedule number {n}.") for n in range(5)}
+
+    seen, cursor = [], None
+    while True:
+        body = search(client, auth_headers, "escrow", limit=2, **({"cursor": cursor} if cursor else {}))
+        assert len(body["results"]) <= 2
+        seen += [r["id"] for r in body["results"]]
+        cursor = body["nextCursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(expected)
+
+    assert client.get("/search", params={"q": "escrow", "cursor": "not-a-cursor"},
+                      headers=auth_headers).status_code == 400
+
+def test_users_only_see_their_own_content(client, auth_headers):
+    add_document(user_id(client, auth_headers), "private.pdf", "Subrogation waiver for the tenant.")
+    name = f"user-{uuid.uuid4().hex[:8]}"
+    token = client.post("/register", data={
+        "username": name, "email": f"{name}@example.com", "password": "test-password"
+    }).json()["access_token"]
+
+    assert search(client, {"Authorization": f"Bearer {token}"}, "subrogation")["results"] == []
+    assert len(search(client, auth_headers, "subrogation")["results"]) == 1
+
+def test_reanalysis_reindexes_the_summary(client, auth_headers, document_id, monkeypatch):
+    assert search(client, auth_headers, "novation")["results"] == []
+
+    async def reanalysis(*args, **kwargs):
+        return "The novation clause needs the counterparty's written consent."
+    monkeypatch.setattr(lexibridge, "run_ai_analysis", reanalysis)
+    response = client.post("/analyze-document", data={"documentId": document_id}, headers=auth_headers)
+    assert response.status_code == 200
+
+    results = search(client, auth_headers, "novation")["results"]
+    assert {(r["type"], r["documentId"]) for r in results} == {("document", document_id), ("response", document_id)}
+    document = next(r for r in results if r["type"] == "document")
+    assert document["snippets"][0]["field"] == "aiSummary"
+
+class TextSearchCollection:
+    """Stands in for a MongoDB collection: $text matches any query term, best score first"""
+
+    def __init__(self, items):
+        self.items = items
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return self
+
+    def sort(self, keys):
+        return iter(sorted(self.items, key=lambda item: item["score"], reverse=True))
+
+def test_mongo_query_is_stemmed_but_requires_every_term(monkeypatch):
+    documents = TextSearchCollection([
+        {"_id": "a", "userId": "u", "documentName": "a.pdf", "documentContent": "Termination fees apply.", "score": 1.0},
+        {"_id": "b", "userId": "u", "documentName": "b.pdf", "documentContent": "Termination on notice.", "score": 3.0},
+        {"_id": "c", "userId": "u", "documentName": "c.pdf", "documentContent": "Fees terminate early.", "score": 2.0},
+    ])
+    responses = TextSearchCollection([])
+    monkeypatch.setattr(lexibridge, "db", object())
+    monkeypatch.setattr(lexibridge, "documents_collection", documents)
+    monkeypatch.setattr(lexibridge, "responses_collection", responses)
+
+    page, has_more = lexibridge.search_user_content("u", "terminate the fees", 0, 10)
+
+    assert documents.queries[0]["$text"] == {"$search": "terminate fees"}
+    assert [item["_id"] for _, _, item in page] == ["c", "a"]
+    assert not has_more
+
+@pytest.mark.parametrize("query, expected", [
+    ("terminate the fees", "terminate fees"),
+    ('"late payment"', "late payment"),
+    ("the", ""),
+])
+def test_mongo_text_query_leaves_terms_unquoted(query, expected):
+    assert lexibridge.mongo_text_query(query) == expected
@@ -0,0 +1,163 @@
+import asyncio
+import json
+
+import jwt
+import pytest
+
+import app.main as lexibridge
+from app.main import UploadAdmissionMiddleware
+
+from .conftest import synthetic_pdf
+
+def bearer(user_id: str) -> bytes:
+    token = jwt.encode({"userId": user_id}, lexibridge.JWT_SECRET, algorithm=lexibridge.JWT_ALGORITHM)
+    return f"Bearer {token}".encode()
+
+def upload_scope(user_id: str = None) -> dict:
+    headers = [(b"authorization", bearer(user_id))] if user_id else []
+    return {"type": "http", "method": "POST", "path": "/upload-document", "headers": headers}
+
+class GatedApp:
+    """Inner ASGI app that drains the body, then holds the request until released"""
+
+    def __init__(self, fail: bool = False):
+        self.gate = asyncio.Event()
+        self.entered = 0
+        self.fail = fail
+
+    async def __call__(self, scope, receive, send):
+        self.entered += 1
+        while True:
+            message = await receive()
+            if not message.get("more_body"):
+                break
+        await self.gate.wait()
+        if self.fail:
+            raise RuntimeError("handler failed")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+async def call(middleware, scope, chunks=(b"",)):
+    """Run one request through the middleware and return (status, headers, body)"""
+    pending = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+               for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return pending.pop(0) if pending else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, receive, send)
+    start = next(m for m in sent if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return start["status"], dict(start["headers"]), body
+
+async def until(condition, timeout: float = 2.0):
+    for _ in range(int(timeout / 0.005)):
+        if condition():
+            return
+        await asyncio.sleep(0.005)
+    raise AssertionError("condition not reached in time")
+
+def test_oversized_content_length_is_rejected_before_the_app(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(lexibridge, "MAX_UPLOAD_BYTES", 1024)
+    client.get("/health")  # build the middleware stack
+    before = lexibridge.upload_admission.metrics()["rejectedTooLarge"]
+    response = client.post(
+        "/upload-document", files={"file": ("big.pdf", b"x" * 200_000, "application/pdf")}, headers=auth_headers
+    )
+    assert response.status_code == 413
+    assert "limit" in response.json()["detail"]
+    assert lexibridge.upload_admission.metrics()["rejectedTooLarge"] == before + 1
+    assert lexibridge.upload_admission.metrics()["inFlight"] == 0
+
+def test_chunked_body_past_the_limit_is_aborted(monkeypatch):
+    monkeypatch.setattr(lexibridge, "MAX_UPLOAD_BYTES", 1024)
+    inner = GatedApp()
+    inner.gate.set()
+    middleware = UploadAdmissionMiddleware(inner)
+    chunk = b"x" * (lexibridge.MULTIPART_OVERHEAD_BYTES // 2)
+
+    status, _, body = asyncio.run(call(middleware, upload_scope("alice"), [chunk] * 4))
+
+    assert status == 413
+    assert "limit" in json.loads(body)["detail"]
+    assert inner.entered == 1  # admitted on headers alone, cut off while streaming
+    metrics = middleware.metrics()
+    assert metrics["rejectedTooLarge"] == 1
+    assert metrics["inFlight"] == 0
+    assert middleware.in_flight_per_user == {}
+
+def test_global_cap_sheds_with_503_and_retry_after(monkeypatch):
+    monkeypatch.setattr(lexibridge, "UPLOAD_MAX_CONCURRENT", 2)
+    monkeypatch.setattr(lexibridge, "UPLOAD_MAX_CONCURRENT_PER_USER", 5)
+
+    async def scenario():
+        inner = GatedApp()
+        middleware = UploadAdmissionMiddleware(inner)
+        held = [asyncio.ensure_future(call(middleware, upload_scope(user))) for user in ("alice", "bob")]
+        await until(lambda: inner.entered == 2)
+
+        shed = await call(middleware, upload_scope("carol"))
+        assert middleware.in_flight == 2
+
+        inner.gate.set()
+        admitted = await asyncio.gather(*held)
+        return middleware, shed, admitted
+
+    middleware, (status, headers, body), admitted = asyncio.run(scenario())
+    assert status == 503
+    assert headers[b"retry-after"] == str(lexibridge.UPLOAD_RETRY_AFTER_SECONDS).encode()
+    assert "busy" in json.loads(body)["detail"]
+    assert [result[0] for result in admitted] == [200, 200]
+    metrics = middleware.metrics()
+    assert metrics["shedGlobal"] == 1 and metrics["admitted"] == 2
+    assert metrics["inFlight"] == 0
+    assert middleware.in_flight_per_user == {}
+
+def test_per_user_cap_sheds_with_429_and_retry_after(monkeypatch):
+    monkeypatch.setattr(lexibridge, "UPLOAD_MAX_CONCURRENT", 10)
+    monkeypatch.setattr(lexibridge, "UPLOAD_MAX_CONCURRENT_PER_USER", 1)
+
+    async def scenario():
+        inner = GatedApp()
+        middleware = UploadAdmissionMiddleware(inner)
+        held = asyncio.ensure_future(call(middleware, upload_scope("alice")))
+        await until(lambda: inner.entered == 1)
+
+        shed = await call(middleware, upload_scope("alice"))
+        other = asyncio.ensure_future(call(middleware, upload_scope("bob")))
+        await until(lambda: inner.entered == 2)  # another user is still admitted
+
+        inner.gate.set()
+        await asyncio.gather(held, other)
+        return middleware, shed
+
+    middleware, (status, headers, body) = asyncio.run(scenario())
+    assert status == 429
+    assert headers[b"retry-after"] == str(lexibridge.UPLOAD_RETRY_AFTER_SECONDS).encode()
+    assert "Too many uploads" in json.loads(body)["detail"]
+    assert middleware.metrics()["shedPerUser"] == 1
+    assert middleware.in_flight_per_user == {}
+
+def test_counters_are_released_when_the_handler_fails():
+    inner = GatedApp(fail=True)
+    inner.gate.set()
+    middleware = UploadAdmissionMiddleware(inner)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(call(middleware, upload_scope("alice")))
+
+    assert middleware.metrics()["inFlight"] == 0
+    assert middleware.in_flight_per_user == {}
+
+def test_counters_return_to_zero_after_real_uploads(client, auth_headers, groq):
+    for _ in range(3):
+        response = client.post(
+            "/upload-document", files={"file": ("contract.pdf", synthetic_pdf(), "application/pdf")}, headers=auth_headers
+        )
+        assert response.status_code == 200
+    assert lexibridge.upload_admission.metrics()["inFlight"] == 0
+    assert lexibridge.upload_admission.in_flight_per_user == {}